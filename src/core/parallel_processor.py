@@ -5,12 +5,39 @@ Implements multi-threading and parallel processing for faster performance
 import os
 import subprocess
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
-from typing import Callable, List, Any, Optional, Dict
+from typing import Callable, List, Any, Optional, Dict, Iterable, Tuple
 from pathlib import Path
+import queue
 import time
 
+from src.utils.audio_info import copy_mp3_frames, probe_mp3, read_audio_duration, read_wav_duration
+
+
+def join_overlapping_texts(parts: List[str], max_overlap: int) -> Tuple[str, int]:
+    """
+    Join transcripts of overlapping chunks, dropping the words repeated at each seam
+    Example: ["hello big world", "big world goodbye"] -> "hello big world goodbye"
+
+    Only the seam between two chunks is compared (longest tail == head run, up to
+    max_overlap words), so real repetition inside a chunk ("很 很 好") is kept.
+
+    Returns:
+        (joined text, number of words removed)
+    """
+    words = parts[0].split() if parts else []
+    removed = 0
+    for part in parts[1:]:
+        next_words = part.split()
+        tail = [w.lower() for w in words[-max_overlap:]]
+        head = [w.lower() for w in next_words[:max_overlap]]
+        overlap = next((n for n in range(min(len(tail), len(head)), 0, -1)
+                        if tail[-n:] == head[:n]), 0)
+        words.extend(next_words[overlap:])
+        removed += overlap
+    return " ".join(words), removed
+
 
 @dataclass
 class Task:
@@ -106,6 +133,62 @@ class ParallelProcessor:
 
         return results
 
+    def run_incremental(self, tasks: Iterable[Task], total: int) -> Dict[str, Any]:
+        """
+        Execute tasks in iteration order, pulling them from an iterable lazily
+
+        At most max_workers * 2 tasks are queued at a time, so a generator of
+        tasks is consumed as workers free up instead of being built up front.
+
+        Args:
+            tasks: Iterable of Task objects (may be a generator)
+            total: Number of tasks, for progress reporting
+
+        Returns:
+            Dictionary mapping task IDs to results
+        """
+        results = {}
+        self.cancel_flag.clear()
+        task_iter = iter(tasks)
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+
+            def submit_next():
+                task = next(task_iter, None)
+                if task is not None:
+                    in_flight[executor.submit(task.func, *task.args, **task.kwargs)] = task
+
+            for _ in range(self.max_workers * 2):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                if self.is_cancelled():
+                    for f in in_flight:
+                        f.cancel()
+                    break
+
+                for future in done:
+                    task = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        results[task.id] = result
+                        completed += 1
+
+                        if self.progress_callback:
+                            self.progress_callback(completed, total, task.id, result)
+
+                    except Exception as e:
+                        results[task.id] = {"error": str(e)}
+                        if self.progress_callback:
+                            self.progress_callback(completed, total, task.id, None, error=str(e))
+
+                    submit_next()
+
+        return results
+
     def download_parallel(self, urls: List[str], output_dir: str) -> List[str]:
         """
         Download multiple files in parallel
@@ -208,9 +291,14 @@ class ParallelProcessor:
 class ChunkedProcessor:
     """Handles splitting and merging of audio/text for parallel processing"""
 
+    MAX_BOUNDARY_WORDS = 12  # Longest repeat checked at a chunk seam
+
     def __init__(self):
         self.temp_dir = "temp/chunks"
         os.makedirs(self.temp_dir, exist_ok=True)
+        # Silence files built so far, by file name (one ffmpeg run per parameter set)
+        self._silence_paths = {}
+        self._silence_lock = threading.Lock()
 
     def split_audio_for_stt(
         self,
@@ -230,16 +318,18 @@ class ChunkedProcessor:
         Returns:
             List of chunk file paths
         """
-        # Get audio duration
-        cmd_duration = [
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            audio_path
-        ]
-        result = subprocess.run(cmd_duration, capture_output=True, text=True,
-                                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-        total_duration = float(result.stdout.strip())
+        # Get audio duration - MP3/WAV header first, ffprobe only for other formats
+        total_duration = read_audio_duration(audio_path)
+        if total_duration is None:
+            cmd_duration = [
+                'ffprobe', '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1',
+                audio_path
+            ]
+            result = subprocess.run(cmd_duration, capture_output=True, text=True,
+                                    creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+            total_duration = float(result.stdout.strip())
 
         print(f"[ChunkedProcessor] Total audio duration: {total_duration:.2f}s")
 
@@ -292,12 +382,10 @@ class ChunkedProcessor:
             first_chunk_start = 0.0
             # Last chunk calculation
             last_chunk_start = (len(chunks) - 1) * effective_step
-            # Get duration of last chunk
-            cmd_last = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                       '-of', 'default=noprint_wrappers=1:nokey=1', chunks[-1]]
-            result_last = subprocess.run(cmd_last, capture_output=True, text=True,
-                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            last_chunk_duration = float(result_last.stdout.strip()) if result_last.returncode == 0 else chunk_duration
+            # Get duration of last chunk (PCM WAV we just wrote - read the header)
+            last_chunk_duration = read_wav_duration(chunks[-1])
+            if last_chunk_duration is None:
+                last_chunk_duration = chunk_duration
             last_chunk_end = last_chunk_start + last_chunk_duration
 
             print(f"[ChunkedProcessor] Coverage: {first_chunk_start:.2f}s - {last_chunk_end:.2f}s")
@@ -384,51 +472,110 @@ class ChunkedProcessor:
         if not chunk_paths:
             return False
 
-        # Create concat file
-        concat_file = os.path.join(self.temp_dir, "concat_list.txt")
-
-        with open(concat_file, 'w') as f:
-            for chunk_path in chunk_paths:
-                f.write(f"file '{os.path.abspath(chunk_path)}'\n")
-                if add_silence and chunk_path != chunk_paths[-1]:
-                    # Add silence between chunks
-                    silence_path = self._create_silence(silence_duration)
-                    f.write(f"file '{os.path.abspath(silence_path)}'\n")
+        # Same MP3 stream format everywhere -> stream copy, silence encoded to match.
+        # Otherwise (mixed formats / not MP3) decode and re-encode once.
+        infos = [probe_mp3(path) for path in chunk_paths]
+        same_format = all(infos) and len({info.stream_key for info in infos}) == 1
+
+        silence_path = None
+        if add_silence and silence_duration > 0 and len(chunk_paths) > 1:
+            if same_format:
+                first = infos[0]
+                silence_path = self.create_mp3_silence(
+                    silence_duration, first.sample_rate,
+                    1 if first.channel_mode == 3 else 2, first.bitrate
+                )
+                silence_info = probe_mp3(silence_path) if silence_path else None
+                if silence_info is None or silence_info.stream_key != first.stream_key:
+                    same_format = False
+            if not same_format:
+                silence_path = self._create_silence(silence_duration)
+
+        # Concat list is passed through stdin - no list file to create/delete
+        # (forward slashes: the concat demuxer chokes on Windows backslashes)
+        def entry(path: str) -> str:
+            return "file '" + os.path.abspath(path).replace('\\', '/') + "'\n"
+
+        lines = []
+        for i, chunk_path in enumerate(chunk_paths):
+            if i and silence_path:
+                # Add silence between chunks
+                lines.append(entry(silence_path))
+            lines.append(entry(chunk_path))
 
         # Merge using concat demuxer
         cmd_merge = [
-            'ffmpeg', '-y',
+            'ffmpeg', '-y', '-v', 'error',
+            '-protocol_whitelist', 'file,pipe',
             '-f', 'concat',
             '-safe', '0',
-            '-i', concat_file,
-            '-c', 'copy',
-            output_path
+            '-i', 'pipe:0',
         ]
+        if same_format:
+            cmd_merge += ['-c', 'copy']
+        else:
+            print("[ChunkedProcessor] Chunks differ in format - re-encoding merge")
+            cmd_merge += ['-c:a', 'libmp3lame', '-b:a', '192k']
+        cmd_merge.append(output_path)
+
+        result = subprocess.run(cmd_merge, input=''.join(lines).encode('utf-8'), capture_output=True,
+                                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
 
-        result = subprocess.run(cmd_merge, capture_output=True)
+        return result.returncode == 0
 
-        # Cleanup
-        if os.path.exists(concat_file):
-            os.remove(concat_file)
+    def _create_silence(self, duration: float) -> Optional[str]:
+        """Create (once) a silent WAV file"""
+        return self._cached_silence(
+            f"silence_{duration}.wav",
+            ['-i', 'anullsrc=r=16000:cl=mono', '-t', str(duration), '-c:a', 'pcm_s16le']
+        )
 
-        return result.returncode == 0
+    def create_mp3_silence(self, duration: float, sample_rate: int,
+                           channels: int, bitrate: int) -> Optional[str]:
+        """
+        Create (once) a CBR MP3 silence file matching the given stream parameters
 
-    def _create_silence(self, duration: float) -> str:
-        """Create silent audio file"""
-        silence_path = os.path.join(self.temp_dir, f"silence_{duration}.wav")
+        No ID3/Xing header, so its frames can be appended directly between
+        segments of the same format.
 
-        if not os.path.exists(silence_path):
-            cmd = [
-                'ffmpeg', '-y',
-                '-f', 'lavfi',
-                '-i', f'anullsrc=r=16000:cl=mono',
-                '-t', str(duration),
-                '-c:a', 'pcm_s16le',
-                silence_path
-            ]
-            subprocess.run(cmd, capture_output=True)
+        Returns:
+            Path to the silence file, or None if ffmpeg failed
+        """
+        return self._cached_silence(
+            f"silence_{duration}_{sample_rate}_{channels}_{bitrate}.mp3",
+            ['-i', f'anullsrc=r={sample_rate}:cl={"mono" if channels == 1 else "stereo"}',
+             '-t', str(duration),
+             '-c:a', 'libmp3lame', '-b:a', str(bitrate),
+             '-write_xing', '0', '-id3v2_version', '0']
+        )
+
+    def _cached_silence(self, filename: str, encode_args: List[str]) -> Optional[str]:
+        """
+        Build a lavfi silence file once and reuse it
+
+        Memoized per instance (no stat per merge) and written under a temp name
+        then renamed, so a concurrent merge never reads a half-written file.
+
+        Returns:
+            Path to the silence file, or None if ffmpeg failed
+        """
+        with self._silence_lock:
+            silence_path = self._silence_paths.get(filename)
+            if silence_path:
+                return silence_path
+
+            silence_path = os.path.join(self.temp_dir, filename)
+            if not os.path.exists(silence_path):
+                tmp_path = os.path.join(self.temp_dir, f"tmp{os.getpid()}_{filename}")
+                cmd = ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', *encode_args, tmp_path]
+                result = subprocess.run(cmd, capture_output=True,
+                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+                if result.returncode != 0 or not os.path.exists(tmp_path):
+                    return None
+                os.replace(tmp_path, silence_path)
 
-        return silence_path
+            self._silence_paths[filename] = silence_path
+            return silence_path
 
     def merge_results(self, results: List[Any]) -> Any:
         """
@@ -442,38 +589,145 @@ class ChunkedProcessor:
         """
         # Simple concatenation for text results
         if all(isinstance(r, str) for r in results):
-            merged = " ".join(results)
-            return self._remove_boundary_duplicates(merged)
+            return self._remove_boundary_duplicates(results)
 
         # For dict results with 'text' key
         if all(isinstance(r, dict) and 'text' in r for r in results):
-            merged = " ".join(r['text'] for r in results)
-            return self._remove_boundary_duplicates(merged)
+            return self._remove_boundary_duplicates([r['text'] for r in results])
 
         return results
 
-    def _remove_boundary_duplicates(self, text: str) -> str:
-        """
-        Remove duplicate words at chunk boundaries caused by overlap
-        """
-        words = text.split()
-        if len(words) <= 1:
-            return text
-
-        cleaned = [words[0]]
-        for i in range(1, len(words)):
-            # Skip if same as previous word (case insensitive)
-            if words[i].lower() != words[i-1].lower():
-                cleaned.append(words[i])
-
-        result = " ".join(cleaned)
-        if len(words) != len(cleaned):
-            print(f"[ChunkedProcessor] Removed {len(words) - len(cleaned)} duplicate words at boundaries")
-        return result
+    def _remove_boundary_duplicates(self, parts: List[str]) -> str:
+        """Join chunk texts, removing words duplicated at chunk boundaries by overlap"""
+        text, removed = join_overlapping_texts(parts, self.MAX_BOUNDARY_WORDS)
+        if removed:
+            print(f"[ChunkedProcessor] Removed {removed} duplicate words at boundaries")
+        return text
 
     def cleanup_chunks(self):
         """Remove all temporary chunk files"""
         import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-        os.makedirs(self.temp_dir, exist_ok=True)
+        with self._silence_lock:
+            # Silence files live in temp_dir too - forget them so the next merge rebuilds
+            self._silence_paths.clear()
+            if os.path.exists(self.temp_dir):
+                shutil.rmtree(self.temp_dir)
+            os.makedirs(self.temp_dir, exist_ok=True)
+
+
+class StreamingAudioMerger:
+    """
+    Append MP3 segments to the output in order while the rest are still being generated
+
+    Segments can finish in any order; they are held in a reorder buffer until all
+    earlier segments have arrived, then their audio frames are copied to the output
+    by a background thread. Only works when every segment has the same MP3 stream
+    format - otherwise finish() returns False and the caller merges the files itself.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        total: int,
+        chunked_processor: ChunkedProcessor,
+        add_silence: bool = True,
+        silence_duration: float = 0.1
+    ):
+        self.output_path = output_path
+        self.total = total
+        self.chunked_processor = chunked_processor
+        self.add_silence = add_silence
+        self.silence_duration = silence_duration
+
+        self._queue = queue.Queue()
+        self._ok = True
+        self._written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, index: int, path: Optional[str]):
+        """Report a finished segment (path=None if it failed and should be skipped)"""
+        self._queue.put((index, path))
+
+    def finish(self) -> bool:
+        """Wait for the merger; True if output_path holds all valid segments"""
+        self._queue.put(None)
+        self._thread.join()
+        return self._ok and self._written > 0
+
+    def abort(self):
+        """Stop merging and remove the partial output"""
+        self._ok = False
+        self.finish()
+        try:
+            os.unlink(self.output_path)
+        except OSError:
+            pass
+
+    def _run(self):
+        pending = {}
+        next_index = 0
+        stream_key = None
+        silence = None
+        out = None
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                if not self._ok:
+                    continue
+
+                index, path = item
+                pending[index] = path
+
+                while next_index in pending:
+                    path = pending.pop(next_index)
+                    next_index += 1
+                    if path is None:
+                        continue
+
+                    info = probe_mp3(path)
+                    if info is None or (stream_key is not None and info.stream_key != stream_key):
+                        print(f"[StreamingMerger] Segment {next_index - 1} has a different format - falling back to ffmpeg merge")
+                        self._ok = False
+                        break
+
+                    if out is None:
+                        stream_key = info.stream_key
+                        if self.add_silence and self.silence_duration > 0:
+                            silence = self._load_silence(info, stream_key)
+                            if silence is None:
+                                self._ok = False
+                                break
+                        out = open(self.output_path, 'wb')
+                    elif silence is not None:
+                        out.write(silence)
+
+                    self._written += copy_mp3_frames(path, info, out)
+        except OSError as e:
+            print(f"[StreamingMerger] Write error: {e}")
+            self._ok = False
+        finally:
+            if out is not None:
+                out.close()
+
+        if self._ok and next_index < self.total:
+            # Some segments never arrived (cancelled)
+            self._ok = False
+
+    def _load_silence(self, info, stream_key) -> Optional[bytes]:
+        """Silence frames with the same stream format as the segments"""
+        channels = 1 if info.channel_mode == 3 else 2
+        silence_path = self.chunked_processor.create_mp3_silence(
+            self.silence_duration, info.sample_rate, channels, info.bitrate
+        )
+        if silence_path is None:
+            return None
+        silence_info = probe_mp3(silence_path)
+        if silence_info is None or silence_info.stream_key != stream_key:
+            return None
+        with open(silence_path, 'rb') as f:
+            f.seek(silence_info.audio_start)
+            return f.read(silence_info.audio_end - silence_info.audio_start)
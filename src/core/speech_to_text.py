@@ -1,30 +1,146 @@
 """
 Speech to Text - VERSION KHONG CAN PYDUB CHO FILE NHO
 =====================================================
-- File < 25MB: Gui truc tiep, KHONG can pydub
-- File > 25MB: Moi can pydub de chia chunks
+- File < 25MB va < 25 phut: Gui truc tiep, KHONG can pydub
+- File lon/dai: Cat chunks bang FFmpeg theo thoi luong ffprobe (pydub chi la fallback)
 """
 
+import gc
+import io
 import os
+import re
 import time
+import threading
 import tempfile
 import subprocess
+from bisect import bisect_right
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Import SDK 1 lan khi load module (khong phai moi lan goi) - van optional
+try:
+    from groq import Groq as _Groq
+except ImportError:
+    _Groq = None
+
+try:
+    from pydub import AudioSegment as _AudioSegment
+except ImportError:
+    _AudioSegment = None
+
+# orjson parse verbose_json nhanh hon stdlib json 3-6x (optional)
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Temp chunk files tren RAM (tmpfs) neu co - tranh ghi/doc disk cho moi chunk
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class RateBudget:
+    """
+    Token-bucket theo audio-seconds cua Groq - doc tu header x-ratelimit-*
+
+    Khi chua biet budget (chua co header), chi cho toi da `initial_concurrency`
+    request cung luc. Khi da biet, moi request chi can budget >= so giay cua chunk.
+    """
+
+    _DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+    _UNIT_SEC = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+    def __init__(self, initial_concurrency: int = 2):
+        self.initial_concurrency = initial_concurrency
+        self.remaining = None  # None = chua biet
+        self.reset_at = 0.0
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def _can_start(self, seconds: float) -> bool:
+        if self.remaining is not None and time.time() >= self.reset_at:
+            # Bucket da reset -> quay ve trang thai chua biet
+            self.remaining = None
+        if self.remaining is None:
+            return self.in_flight < self.initial_concurrency
+        # Het budget -> cho den reset_at (ke ca khi khong con request nao dang chay,
+        # ke ca request khong biet thoi luong - seconds = 0)
+        return self.remaining > 0 and self.remaining >= seconds
+
+    def acquire(self, seconds: float):
+        """Cho den khi du budget cho 1 chunk dai `seconds` giay"""
+        with self._cond:
+            while not self._can_start(seconds):
+                timeout = max(self.reset_at - time.time(), 0.1) if self.remaining is not None else None
+                self._cond.wait(timeout)
+            self.in_flight += 1
+            if self.remaining is not None:
+                self.remaining -= seconds
+
+    def release(self, headers=None, throttled_wait: float = 0.0):
+        """
+        Tra slot va cap nhat budget tu response headers (neu co)
+
+        throttled_wait > 0 (bi 429): coi bucket la het cho den thoi diem reset trong
+        header, hoac throttled_wait giay neu header khong cho biet.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if headers is not None:
+                self.update(headers)
+            if throttled_wait:
+                self.remaining = 0.0
+                if self.reset_at <= time.time():
+                    self.reset_at = time.time() + throttled_wait
+            self._cond.notify_all()
+
+    def update(self, headers):
+        remaining = headers.get('x-ratelimit-remaining-audio-seconds')
+        reset = (
+            headers.get('retry-after')
+            or headers.get('x-ratelimit-reset-audio-seconds')
+            or headers.get('x-ratelimit-reset')
+        )
+        if remaining is not None:
+            try:
+                self.remaining = float(remaining)
+            except ValueError:
+                return
+        elif headers.get('retry-after'):
+            # 429 khong kem budget -> coi nhu het
+            self.remaining = 0.0
+        if reset:
+            self.reset_at = time.time() + self._parse_duration(reset)
+
+    @classmethod
+    def _parse_duration(cls, value: str) -> float:
+        """'2m59.5s' / '7.66s' / '30' -> giay"""
+        try:
+            return float(value)
+        except ValueError:
+            return sum(float(n) * cls._UNIT_SEC[u] for n, u in cls._DURATION_RE.findall(value))
+
 
 class SpeechToText:
     """Speech to Text - TOI UU TOC DO TOI DA"""
 
     MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB
+    MAX_DIRECT_DURATION_SEC = 25 * 60  # Gioi han thoi luong 1 request cua Groq
     CHUNK_DURATION_SEC = 120  # 2 phut - chunks nho hon = upload nhanh hon
     MAX_RETRIES = 2  # Giam retry de khong mat thoi gian
-    MAX_WORKERS = 2  # GIAM xuong 2 de TRANH RATE LIMIT cua Groq API
+    MAX_WORKERS = 2  # So request song song khi chua biet rate limit cua Groq API
+    MAX_WORKERS_CAP = 16  # Toi da khi RateBudget con nhieu audio-seconds
+    BATCH_GAP_SEC = 1.0  # Khoang lang chen giua cac file khi gop batch
+    UPLOAD_BUFFER_SIZE = 1 << 20  # 1MB buffer doc file upload
 
     def __init__(self):
         self.model = None
         self.current_model = None
+        self._client = None
+        self._client_key = None
+        self._client_lock = threading.Lock()
+        # Budget dung chung cho moi request cua instance (rate limit tinh theo account)
+        self.rate_budget = RateBudget(initial_concurrency=self.MAX_WORKERS)
 
     def transcribe_with_groq(
         self,
@@ -35,13 +151,7 @@ class SpeechToText:
     ) -> dict:
         """Transcribe bang Groq API"""
 
-        # Import groq TRONG HAM, khong o dau file
-        try:
-            from groq import Groq
-        except ImportError:
-            raise ImportError("Chua cai groq! Chay: pip install groq")
-
-        client = Groq(api_key=api_key)
+        client = self._get_client(api_key)
 
         if progress_callback:
             progress_callback(10)
@@ -50,15 +160,193 @@ class SpeechToText:
         file_size = os.path.getsize(audio_path)
         file_size_mb = file_size / (1024 * 1024)
 
+        # Kiem tra thoi luong bang ffprobe - chi doc header, KHONG decode
+        duration = self._probe_duration(audio_path)
+
         if status_callback:
-            status_callback(f"File size: {file_size_mb:.1f} MB")
+            status_callback(f"File size: {file_size_mb:.1f} MB, {duration:.0f}s")
 
-        if file_size <= self.MAX_FILE_SIZE:
+        if file_size <= self.MAX_FILE_SIZE and duration <= self.MAX_DIRECT_DURATION_SEC:
             # FILE NHO - Gui truc tiep, KHONG CAN PYDUB
             return self._transcribe_direct(client, audio_path, progress_callback, status_callback)
         else:
-            # FILE LON - Can chia chunks, can pydub
-            return self._transcribe_large_file(client, audio_path, progress_callback, status_callback)
+            # FILE LON HOAC DAI - Chia chunks theo thoi luong
+            return self._transcribe_large_file(
+                client, audio_path, progress_callback, status_callback, duration=duration
+            )
+
+    def _get_client(self, api_key: str):
+        """Tao Groq client 1 lan cho moi api_key - giu connection pool giua cac lan goi"""
+        if _Groq is None:
+            raise ImportError("Chua cai groq! Chay: pip install groq")
+        # Nhieu worker dung chung instance: tao/doi client duoi lock, tra ve ban cua lan goi nay
+        # (request dang chay giu tham chieu client cu nen khong bi anh huong khi doi key)
+        with self._client_lock:
+            if self._client is None or self._client_key != api_key:
+                self._client = _Groq(api_key=api_key)
+                self._client_key = api_key
+            return self._client
+
+    def transcribe_many(
+        self,
+        audio_paths: List[str],
+        api_key: str,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> List[dict]:
+        """
+        Transcribe NHIEU file nho - GOP thanh 1 request de giam so round-trip
+
+        Cac file co tong size <= 25MB va tong thoi luong <= 25 phut duoc noi lai
+        bang FFmpeg (chen khoang lang giua cac file), gui 1 lan, roi tach transcript
+        theo timestamp cua segments. File vuot gioi han van xu ly rieng qua
+        transcribe_with_groq; file khong doc duoc thoi luong duoc gui 1 minh.
+
+        Returns:
+            List ket qua theo dung thu tu audio_paths
+        """
+        client = self._get_client(api_key)
+        results = [None] * len(audio_paths)
+
+        # Chia nhom: moi nhom co tong size <= MAX_FILE_SIZE va tong thoi luong
+        # (ca khoang lang chen giua) <= MAX_DIRECT_DURATION_SEC
+        batches = []
+        durations = {}
+        current, current_size, current_duration = [], 0, 0.0
+        for i, path in enumerate(audio_paths):
+            size = os.path.getsize(path)
+            duration = self._probe_duration(path)
+            if size > self.MAX_FILE_SIZE or duration > self.MAX_DIRECT_DURATION_SEC:
+                results[i] = self.transcribe_with_groq(path, api_key)
+                continue
+            if duration <= 0:
+                # Khong biet thoi luong -> khong gop duoc an toan, gui rieng
+                batches.append([i])
+                continue
+            durations[i] = duration
+            if current and (
+                current_size + size > self.MAX_FILE_SIZE
+                or current_duration + self.BATCH_GAP_SEC + duration > self.MAX_DIRECT_DURATION_SEC
+            ):
+                batches.append(current)
+                current, current_size, current_duration = [], 0, 0.0
+            if current:
+                current_duration += self.BATCH_GAP_SEC
+            current.append(i)
+            current_size += size
+            current_duration += duration
+        if current:
+            batches.append(current)
+
+        if status_callback:
+            status_callback(f"Gop {len(audio_paths)} file thanh {len(batches)} request...")
+
+        for done, batch in enumerate(batches, 1):
+            paths = [audio_paths[i] for i in batch]
+            try:
+                texts = self._transcribe_batch(
+                    client, paths, [durations.get(i, 0.0) for i in batch]
+                )
+                for i, text in zip(batch, texts):
+                    results[i] = {
+                        "text": text,
+                        "language": "zh",
+                        "segments": [],
+                        "success_rate": 1.0
+                    }
+            except Exception as e:
+                # Gop that bai -> gui tung file nhu cu
+                print(f"[STT] Batch loi ({str(e)[:50]}), gui tung file...")
+                for i in batch:
+                    results[i] = self._transcribe_direct(client, audio_paths[i])
+
+            if progress_callback:
+                progress_callback(int(done / len(batches) * 100))
+
+        return results
+
+    def _transcribe_batch(self, client, paths: List[str], durations: List[float]) -> List[str]:
+        """Noi nhieu file thanh 1 upload, tach transcript theo offset cua tung file"""
+        if len(paths) == 1:
+            text = self._transcribe_chunk(client, paths[0], chunk_seconds=durations[0])
+            if not text:
+                # _transcribe_chunk nuot loi -> raise de caller fallback va tinh la that bai
+                raise Exception("Transcribe that bai (ket qua rong)")
+            return [text]
+
+        # Offset bat dau cua tung file trong audio da noi
+        offsets = []
+        position = 0.0
+        for duration in durations:
+            offsets.append(position)
+            position += duration + self.BATCH_GAP_SEC
+
+        inputs = []
+        filters = []
+        for i, path in enumerate(paths):
+            inputs += ['-i', path]
+            filters.append(
+                f"[{i}:a]aresample=16000,aformat=channel_layouts=mono,"
+                f"apad=pad_dur={self.BATCH_GAP_SEC}[a{i}]"
+            )
+        concat_in = "".join(f"[a{i}]" for i in range(len(paths)))
+        filters.append(f"{concat_in}concat=n={len(paths)}:v=0:a=1[out]")
+
+        with tempfile.NamedTemporaryFile(suffix=".mp3", dir=SHM_DIR, delete=False) as f:
+            temp_path = f.name
+
+        try:
+            cmd = [
+                'ffmpeg', '-y', *inputs,
+                '-filter_complex', ";".join(filters),
+                '-map', '[out]',
+                '-b:a', '24k',
+                temp_path
+            ]
+            subprocess.run(
+                cmd, capture_output=True, check=True,
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            )
+
+            with self._open_for_upload(temp_path) as f:
+                raw = client.audio.transcriptions.with_raw_response.create(
+                    model="whisper-large-v3-turbo",
+                    file=f,
+                    response_format="verbose_json",
+                    language="zh"
+                )
+            data = self._parse_json(raw)
+        finally:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+        # Gan tung segment ve file chua diem giua cua segment
+        parts = [[] for _ in paths]
+        for seg in data.get('segments') or []:
+            start, end, text = seg.get('start', 0), seg.get('end', 0), seg.get('text', '')
+            idx = max(bisect_right(offsets, (start + end) / 2) - 1, 0)
+            parts[idx].append(text.strip())
+
+        return [" ".join(p for p in part if p) for part in parts]
+
+    def _probe_duration(self, audio_path: str) -> float:
+        """Lay thoi luong file (giay) bang ffprobe - chi doc header, khong decode"""
+        try:
+            result = subprocess.run(
+                [
+                    'ffprobe', '-v', 'quiet',
+                    '-show_entries', 'format=duration',
+                    '-of', 'csv=p=0',
+                    audio_path
+                ],
+                capture_output=True, text=True,
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            )
+            return float(result.stdout.strip())
+        except (ValueError, OSError):
+            return 0.0
 
     def _transcribe_direct(
         self,
@@ -77,26 +365,28 @@ class SpeechToText:
 
         for attempt in range(self.MAX_RETRIES):
             try:
-                with open(audio_path, "rb") as f:
+                with self._open_for_upload(audio_path) as f:
                     # Dung whisper-large-v3-turbo - NHANH HON 8X
-                    response = client.audio.transcriptions.create(
+                    raw = client.audio.transcriptions.with_raw_response.create(
                         model="whisper-large-v3-turbo",
                         file=f,
                         response_format="verbose_json",
                         language="zh"
                     )
+                data = self._parse_json(raw)
+                text = data.get('text', '')
 
                 if progress_callback:
                     progress_callback(100)
 
                 if status_callback:
-                    status_callback(f"Hoan thanh: {len(response.text)} ky tu")
+                    status_callback(f"Hoan thanh: {len(text)} ky tu")
 
                 return {
-                    "text": response.text,
-                    "language": getattr(response, 'language', 'zh'),
+                    "text": text,
+                    "language": data.get('language') or 'zh',
                     "segments": [],
-                    "duration": getattr(response, 'duration', 0),
+                    "duration": data.get('duration', 0),
                     "success_rate": 1.0
                 }
 
@@ -125,27 +415,37 @@ class SpeechToText:
         client,
         audio_path: str,
         progress_callback=None,
-        status_callback=None
+        status_callback=None,
+        duration: float = 0.0
     ) -> dict:
         """
         Xu ly file lon - XU LY SONG SONG DE TOI UU TOC DO
         File > 25MB duoc chia thanh chunks va xu ly song song (3-5 chunks cung luc)
-        """
 
-        # CHI IMPORT PYDUB KHI THUC SU CAN
-        try:
-            from pydub import AudioSegment
-        except ImportError:
-            raise ImportError("File qua lon (>25MB), can pydub de chia nho! Chay: pip install pydub")
+        Neu da biet duration (ffprobe), chunk chi la (start, length) va FFmpeg
+        cat truc tiep tung doan - KHONG decode ca file vao RAM.
+        """
 
         if status_callback:
             status_callback("File lon, dang chia nho...")
 
-        audio = AudioSegment.from_file(audio_path)
-        duration_ms = len(audio)
         chunk_length_ms = self.CHUNK_DURATION_SEC * 1000
 
-        chunks = [audio[i:i+chunk_length_ms] for i in range(0, duration_ms, chunk_length_ms)]
+        if duration > 0:
+            duration_ms = int(duration * 1000)
+            chunks = [
+                (i / 1000, min(chunk_length_ms, duration_ms - i) / 1000)
+                for i in range(0, duration_ms, chunk_length_ms)
+            ]
+        else:
+            # ffprobe khong doc duoc -> fallback pydub
+            if _AudioSegment is None:
+                raise ImportError("File qua lon (>25MB), can pydub de chia nho! Chay: pip install pydub")
+
+            audio = _AudioSegment.from_file(audio_path)
+            duration_ms = len(audio)
+            chunks = [audio[i:i+chunk_length_ms] for i in range(0, duration_ms, chunk_length_ms)]
+
         total_chunks = len(chunks)
 
         if status_callback:
@@ -158,80 +458,104 @@ class SpeechToText:
         success_count = 0
 
         # XU LY SONG SONG VOI THREADPOOLEXECUTOR - TOI UU TOC DO
-        max_workers = min(self.MAX_WORKERS, total_chunks)  # Toi da 6 chunks song song
+        # RateBudget quyet dinh so request thuc su chay cung luc
+        max_workers = min(self.MAX_WORKERS_CAP, (os.cpu_count() or 4) * 2, total_chunks)
 
         if status_callback:
             status_callback(f"[TURBO] Xu ly {max_workers} chunks song song...")
 
         print(f"[STT] Processing {total_chunks} chunks with {max_workers} workers...")
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all chunk processing tasks
-            future_to_index = {}
-            for i, chunk in enumerate(chunks):
-                future = executor.submit(self._process_chunk_parallel, client, chunk, i, total_chunks)
-                future_to_index[future] = i
-
-            # Process completed chunks as they finish
-            completed = 0
-            for future in as_completed(future_to_index):
-                idx = future_to_index[future]
-                try:
-                    text = future.result()
-                    if text:
-                        results[idx] = text
-                        success_count += 1
-                        print(f"[STT] Chunk {idx+1}/{total_chunks} OK: {len(text)} chars")
-                    else:
-                        # Chunk failed but don't lose position - mark as empty
+        # TAT GC trong luc upload song song - tranh GC pause giua cac request
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Submit all chunk processing tasks
+                future_to_index = {}
+                for i, chunk in enumerate(chunks):
+                    future = executor.submit(
+                        self._process_chunk_parallel, client, chunk, i, total_chunks, audio_path
+                    )
+                    future_to_index[future] = i
+
+                # Process completed chunks as they finish
+                completed = 0
+                for future in as_completed(future_to_index):
+                    idx = future_to_index[future]
+                    try:
+                        text = future.result()
+                        if text:
+                            results[idx] = text
+                            success_count += 1
+                            print(f"[STT] Chunk {idx+1}/{total_chunks} OK: {len(text)} chars")
+                        else:
+                            # Chunk failed but don't lose position - mark as empty
+                            results[idx] = ""
+                            print(f"[STT] Chunk {idx+1}/{total_chunks} FAILED - marked empty")
+                        completed += 1
+
+                        if progress_callback:
+                            progress = int(10 + (completed / total_chunks) * 85)
+                            progress_callback(progress)
+
+                        if status_callback:
+                            status_callback(f"Xong {completed}/{total_chunks} doan")
+
+                    except Exception as e:
+                        # IMPORTANT: Mark failed chunk as empty to maintain order
                         results[idx] = ""
-                        print(f"[STT] Chunk {idx+1}/{total_chunks} FAILED - marked empty")
-                    completed += 1
-
-                    if progress_callback:
-                        progress = int(10 + (completed / total_chunks) * 85)
-                        progress_callback(progress)
-
-                    if status_callback:
-                        status_callback(f"Xong {completed}/{total_chunks} doan")
-
-                except Exception as e:
-                    # IMPORTANT: Mark failed chunk as empty to maintain order
-                    results[idx] = ""
-                    print(f"[STT] Chunk {idx+1}/{total_chunks} EXCEPTION: {str(e)[:50]}")
-                    if status_callback:
-                        status_callback(f"Loi doan {idx+1}: {str(e)[:30]}")
-                    completed += 1
+                        print(f"[STT] Chunk {idx+1}/{total_chunks} EXCEPTION: {str(e)[:50]}")
+                        if status_callback:
+                            status_callback(f"Loi doan {idx+1}: {str(e)[:30]}")
+                        completed += 1
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+            gc.collect()
 
         if progress_callback:
             progress_callback(100)
 
-        # Join all non-None results in order
-        all_text = [text for text in results if text]
+        # Ghi thang cac doan theo thu tu vao 1 buffer - khong tao list trung gian,
+        # giai phong tung doan ngay sau khi ghi
+        buf = io.StringIO()
+        for i, text in enumerate(results):
+            if not text:
+                continue
+            if buf.tell():
+                buf.write(" ")
+            buf.write(text)
+            results[i] = None
+        out_text = buf.getvalue()
+        buf.close()
 
         # IMPORTANT: Log summary to help debug
         failed_chunks = total_chunks - success_count
         print(f"[STT] SUMMARY: {success_count}/{total_chunks} chunks OK, {failed_chunks} failed")
-        print(f"[STT] Total text: {sum(len(t) for t in all_text)} chars")
+        print(f"[STT] Total text: {len(out_text)} chars")
 
         if failed_chunks > 0:
             print(f"[STT] WARNING: {failed_chunks} chunks failed - missing text!")
 
         return {
-            "text": " ".join(all_text),
+            "text": out_text,
             "language": "zh",
             "success_rate": success_count / total_chunks if total_chunks > 0 else 0
         }
 
-    def _process_chunk_parallel(self, client, chunk, chunk_index: int, total_chunks: int) -> str:
+    def _process_chunk_parallel(
+        self, client, chunk, chunk_index: int, total_chunks: int, audio_path: str = None
+    ) -> str:
         """
         Xu ly 1 chunk - duoc goi song song boi ThreadPoolExecutor
 
         Args:
             client: Groq client
-            chunk: AudioSegment chunk
+            chunk: AudioSegment chunk hoac tuple (start_sec, length_sec)
             chunk_index: Index cua chunk (de maintain order)
             total_chunks: Tong so chunks
+            audio_path: File goc (bat buoc khi chunk la tuple)
 
         Returns:
             Transcribed text hoac empty string neu loi
@@ -239,13 +563,19 @@ class SpeechToText:
         temp_path = None
         try:
             # Export chunk to temp file - GIAM bitrate xuong 24k de upload nhanh hon
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
+            with tempfile.NamedTemporaryFile(suffix=".mp3", dir=SHM_DIR, delete=False) as f:
                 temp_path = f.name
-                # 24k bitrate = file nho hon 30%, upload nhanh hon
-                chunk.export(temp_path, format="mp3", bitrate="24k")
+            self._export_chunk(chunk, temp_path, audio_path)
+
+            if isinstance(chunk, tuple):
+                chunk_seconds = chunk[1]
+            else:
+                chunk_seconds = len(chunk) / 1000
 
             # Transcribe chunk with retry
-            text = self._transcribe_chunk(client, temp_path, status_callback=None)
+            text = self._transcribe_chunk(
+                client, temp_path, status_callback=None, chunk_seconds=chunk_seconds
+            )
             return text if text else ""
 
         except Exception as e:
@@ -260,33 +590,80 @@ class SpeechToText:
                 except Exception as e:
                     print(f"[WARNING] Failed to delete temp file {temp_path}: {e}")
 
-    def _transcribe_chunk(self, client, temp_path: str, status_callback=None) -> str:
+    def _export_chunk(self, chunk, temp_path: str, audio_path: str = None):
+        """Ghi 1 chunk ra mp3 24k - FFmpeg seek truc tiep neu chunk la (start, length)"""
+        if isinstance(chunk, tuple):
+            start, length = chunk
+            cmd = [
+                'ffmpeg', '-y',
+                '-ss', f"{start:.3f}",
+                '-t', f"{length:.3f}",
+                '-i', audio_path,
+                '-vn', '-ac', '1', '-ar', '16000',
+                '-b:a', '24k',
+                temp_path
+            ]
+            subprocess.run(
+                cmd, capture_output=True, check=True,
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            )
+        else:
+            # 24k bitrate = file nho hon 30%, upload nhanh hon
+            chunk.export(temp_path, format="mp3", bitrate="24k")
+
+    @staticmethod
+    def _parse_json(raw) -> dict:
+        """Parse body JSON cua raw response bang orjson thay vi json cua SDK"""
+        return _json.loads(raw.http_response.content)
+
+    def _open_for_upload(self, path: str):
+        """Mo file de upload - buffer 1MB va bao kernel doc tuan tu (read-ahead)"""
+        # Dung open() (khong dung os.fdopen) de giu f.name - SDK can ten file de nhan dang format
+        f = open(path, "rb", buffering=self.UPLOAD_BUFFER_SIZE)
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        return f
+
+    def _transcribe_chunk(
+        self, client, temp_path: str, status_callback=None, chunk_seconds: float = 0.0
+    ) -> str:
         """Transcribe 1 chunk - TOI UU TOC DO TOI DA"""
         for attempt in range(self.MAX_RETRIES):
+            self.rate_budget.acquire(chunk_seconds)
+            headers = None
+            throttled_wait = 0.0
             try:
                 start_time = time.time()
-                with open(temp_path, "rb") as f:
+                with self._open_for_upload(temp_path) as f:
                     # Dung whisper-large-v3-turbo - NHANH HON 8X
-                    response = client.audio.transcriptions.create(
+                    raw = client.audio.transcriptions.with_raw_response.create(
                         model="whisper-large-v3-turbo",
                         file=f,
-                        response_format="verbose_json",  # LAY TIMESTAMP CHO TUNG SEGMENT
+                        response_format="text",  # Chunk chi can text - body nho, khong parse JSON
                         language="zh"
                     )
+                headers = raw.headers
+                text = raw.http_response.text.strip()
                 elapsed = time.time() - start_time
                 print(f"[STT] Chunk done in {elapsed:.1f}s")
-                return response.text
+                return text
             except Exception as e:
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
                 error_msg = str(e).lower()
                 if "rate_limit" in error_msg or "429" in error_msg:
-                    # Giam wait time xuong 5s
-                    wait_time = 5 * (attempt + 1)
-                    print(f"[STT] Rate limit! Waiting {wait_time}s...")
-                    time.sleep(wait_time)
+                    # acquire() lan sau cho den khi bucket reset (retry-after/reset header,
+                    # khong co header thi 5s) - khong retry ngay vao bucket dang het
+                    throttled_wait = 5 * (attempt + 1)
+                    print("[STT] Rate limit! Cho budget reset...")
                     continue
                 if attempt < self.MAX_RETRIES - 1:
                     print(f"[STT] Error: {str(e)[:50]}, retrying...")
                     time.sleep(1)  # Giam tu 2s xuong 1s
+            finally:
+                self.rate_budget.release(headers, throttled_wait)
         return ""
 
     def transcribe_local(
@@ -342,8 +719,18 @@ class SpeechToText:
             return self.transcribe_local(audio_path, model_name, progress_callback, status_callback)
 
 
+_shared_stt = None
+_shared_stt_lock = threading.Lock()
+
+
 def create_speech_to_text():
-    return SpeechToText()
+    """Instance dung chung cho ca process - giu Groq client, whisper model va RateBudget"""
+    global _shared_stt
+    if _shared_stt is None:
+        with _shared_stt_lock:
+            if _shared_stt is None:
+                _shared_stt = SpeechToText()
+    return _shared_stt
 
 
 def transcribe_audio(
@@ -354,5 +741,5 @@ def transcribe_audio(
     progress_callback=None,
     status_callback=None
 ) -> dict:
-    stt = SpeechToText()
+    stt = create_speech_to_text()
     return stt.transcribe(audio_path, engine, api_key, model_name, progress_callback, status_callback)
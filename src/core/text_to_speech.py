@@ -13,14 +13,33 @@ CHUC NANG:
 THU VIEN: edge-tts, ffmpeg
 """
 import asyncio
-import uuid
+import atexit
+import bisect
+import concurrent.futures
+import functools
+import hashlib
+import json
+import logging
+import math
+import operator
+import random
+import shutil
+import struct
+import threading
+import time
 import os
 import subprocess
 import re
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Tuple, Optional, Callable
+from types import MappingProxyType
+from typing import List, Mapping, Tuple, Optional, Callable, Iterable, Iterator
 from dataclasses import dataclass
-from src.core.parallel_processor import ParallelProcessor, ChunkedProcessor, Task
+from src.core.parallel_processor import ParallelProcessor, ChunkedProcessor, StreamingAudioMerger, Task
+from src.utils.audio_info import (
+    is_mp3_head, looks_like_mp3, read_audio_duration
+)
+from src.utils.edge_connector import new_shared_connector
 
 
 @dataclass
@@ -36,6 +55,20 @@ try:
 except ImportError:
     edge_tts = None
 
+# Log theo tung chunk/segment (retry, OK, cache hit) - DEBUG mac dinh khong in, khong format
+logger = logging.getLogger(__name__)
+
+# Tham so subprocess tinh 1 lan: an cua so console tren Windows
+_SUBPROCESS_KW = {'creationflags': subprocess.CREATE_NO_WINDOW} if os.name == 'nt' else {}
+
+# Regex chia cau - compile 1 lan khi load module
+_SENT_SPLIT = re.compile(r'([.!?。！？\n])')
+_SUB_SPLIT = re.compile(r'([,，;；:])')
+_SENT_DELIMS = frozenset('.!?。！？\n')
+
+# Fast-path ASCII: bang 256 byte, dau cau -> 1, con lai -> 0 (quet bang C qua bytes.find)
+_ASCII_DELIM_TABLE = bytes(1 if chr(c) in _SENT_DELIMS else 0 for c in range(256))
+
 # Gemini TTS
 try:
     from google import genai
@@ -45,6 +78,247 @@ except ImportError:
     types = None
 
 
+# Huong dan toc do cho Gemini: <0.8 | [0.8, 1.0) | [1.0, 1.1] | (1.1, 1.3] | >1.3
+_SPEED_BOUNDS = (0.8, 1.0, math.nextafter(1.1, math.inf), math.nextafter(1.3, math.inf))
+_SPEED_INSTRUCTIONS = (
+    "Read very slowly and clearly: ",
+    "Read slowly: ",
+    "",
+    "Read at a slightly faster pace: ",
+    "Read quickly: ",
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _speed_to_rate(speed: float) -> str:
+    """Chuyen speed (0.5 - 2.0) thanh rate string cho edge-tts, vd. 1.2 -> '+20%'"""
+    rate_percent = int((speed - 1.0) * 100)
+    return f"+{rate_percent}%" if rate_percent >= 0 else f"{rate_percent}%"
+
+
+def _speed_instruction(speed: float) -> str:
+    """Cau huong dan toc do dat truoc prompt Gemini"""
+    return _SPEED_INSTRUCTIONS[bisect.bisect_right(_SPEED_BOUNDS, speed)]
+
+
+def _backoff(prev: float, base: float, cap: float) -> float:
+    """Decorrelated jitter: min(cap, uniform(base, prev * 3)) - cac worker khong retry cung luc"""
+    return min(cap, random.uniform(base, prev * 3.0))
+
+
+def _ffmpeg_pipe(cmd: List[str], input_data: bytes = None) -> Tuple[bytes, Optional[str]]:
+    """Chay ffmpeg ghi ra pipe:1 - tra ve (stdout bytes, loi hoac None)"""
+    result = subprocess.run(
+        cmd, input=input_data,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        **_SUBPROCESS_KW
+    )
+    if result.returncode == 0:
+        return result.stdout, None
+    return result.stdout, result.stderr.decode('utf-8', errors='ignore') or f"exit code {result.returncode}"
+
+
+def _scan_prefix(directory: str, prefix: str) -> dict:
+    """1 lan scandir: {ten file: kich thuoc} cua cac file bat dau bang prefix"""
+    sizes = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith(prefix):
+                    try:
+                        sizes[entry.name] = entry.stat().st_size
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+    return sizes
+
+
+def _remove_prefix(directory: str, prefix: str):
+    """Xoa tat ca file tam bat dau bang prefix - 1 lan scandir, unlink truc tiep"""
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith(prefix):
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+
+
+def _wav_header(data_size: int, sample_rate: int = 24000,
+                channels: int = 1, sample_width: int = 2) -> bytes:
+    """Header RIFF/WAVE 44 byte cho PCM (mac dinh: Gemini 24kHz mono 16-bit)"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate,
+        channels * sample_width, sample_width * 8,
+        b'data', data_size
+    )
+
+
+class TTSCache:
+    """
+    Cache audio Edge-TTS tren disk theo sha256(voice|rate|text)
+
+    Cau lap lai (intro, outro, cau mau) tra ve ngay, khong goi API.
+    Gioi han so entry, xoa entry it dung nhat (LRU) khi day.
+    Moi thu muc cache chi co 1 instance trong process (lay qua for_dir) - cac
+    TextToSpeech dung chung index, khong ghi de entry cua nhau.
+    """
+
+    MAX_ENTRIES = 500
+    SAVE_INTERVAL = 5.0  # giay - gom nhieu lan put thanh 1 lan ghi index
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def for_dir(cls, cache_dir: Path) -> "TTSCache":
+        """Instance dung chung cho cache_dir (tao lan dau, ghi index khi thoat)"""
+        key = os.path.abspath(cache_dir)
+        with cls._shared_lock:
+            cache = cls._shared.get(key)
+            if cache is None:
+                cache = cls._shared[key] = cls(cache_dir)
+                atexit.register(cache.flush)
+            return cache
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "cache_index.json"
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str) -> str:
+        return hashlib.sha256(f"{voice}|{rate}|{text}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str, output_path: str) -> bool:
+        """Copy audio da cache ra output_path. Tra ve True neu hit"""
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return False
+            cached_path = self.cache_dir / f"{key}.mp3"
+            try:
+                shutil.copyfile(cached_path, output_path)
+            except OSError:
+                # File cache bi xoa ngoai y muon
+                self.index.pop(key, None)
+                self._dirty = True
+                return False
+            entry["hits"] = entry.get("hits", 0) + 1
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return True
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Doc audio da cache vao bo nho. Tra ve None neu miss"""
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            try:
+                with open(self.cache_dir / f"{key}.mp3", 'rb') as f:
+                    data = f.read()
+            except OSError:
+                self.index.pop(key, None)
+                self._dirty = True
+                return None
+            entry["hits"] = entry.get("hits", 0) + 1
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return data
+
+    def put(self, key: str, audio_path: str, voice: str, rate: str):
+        """Luu audio vua tao vao cache"""
+        if self._write_file(key, src_path=audio_path):
+            self._add_entry(key, voice, rate)
+
+    def put_bytes(self, key: str, data: bytes, voice: str, rate: str):
+        """Luu audio (bytes trong bo nho) vao cache"""
+        if self._write_file(key, data=data):
+            self._add_entry(key, voice, rate)
+
+    def _write_file(self, key: str, data: Optional[bytes] = None,
+                    src_path: Optional[str] = None) -> bool:
+        """Ghi ra file tam roi os.replace - crash giua chung khong de lai file cut bi doc la HIT"""
+        tmp_path = self.cache_dir / f"{key}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            if data is None:
+                shutil.copyfile(src_path, tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            os.replace(tmp_path, self.cache_dir / f"{key}.mp3")
+            return True
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _add_entry(self, key: str, voice: str, rate: str):
+        now = time.time()
+        with self._lock:
+            self.index[key] = {
+                "path": f"{key}.mp3",
+                "voice": voice,
+                "rate": rate,
+                "created_at": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self._evict()
+            self._dirty = True
+            due = now - self._last_save >= self.SAVE_INTERVAL
+        if due:
+            self.flush()
+
+    def _evict(self):
+        overflow = len(self.index) - self.MAX_ENTRIES
+        if overflow <= 0:
+            return
+        oldest = sorted(self.index, key=lambda k: self.index[k].get("last_used", 0))[:overflow]
+        for key in oldest:
+            self.index.pop(key, None)
+            try:
+                os.unlink(self.cache_dir / f"{key}.mp3")
+            except OSError:
+                pass
+
+    def flush(self):
+        """Ghi index ra disk neu co thay doi (goi dinh ky tu put va khi thoat)"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                payload = json.dumps(self.index)
+                self._dirty = False
+                self._last_save = time.time()
+            tmp_path = self.index_path.with_suffix(".tmp")
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.index_path)
+            except OSError as e:
+                print(f"[TTS Cache] Khong luu duoc index: {e}")
+
+
 class TextToSpeech:
     """Tao giong doc AI - Ho tro Edge-TTS, Gemini TTS, gTTS, VietTTS"""
 
@@ -75,10 +349,28 @@ class TextToSpeech:
         "vi-VN-NamMinhNeural": "Nam Minh (Viet - tram, truyen cam)",
     }
 
+    # Tap giong hop le - tinh 1 lan khi load class
+    _VOICE_KEYS = frozenset(VOICES) | frozenset(GEMINI_VOICES)
+
     # Gioi han ky tu cho moi chunk
     # Tang len 1500 de giong doc lien mach hon, it bi ngat quang
     MAX_CHUNK_SIZE = 1500
 
+    # So chunk Edge-TTS chay dong thoi cho text dai (tranh bi throttle)
+    LONG_TEXT_CONCURRENCY = 12
+
+    # So segment Edge-TTS goi dong thoi trong generate_parallel (1 event loop, khong thread)
+    EDGE_SEGMENT_CONCURRENCY = 10
+
+    # So request Gemini song song cho text dai (than thien voi rate limit)
+    GEMINI_MAX_WORKERS = 4
+
+    # Bitrate MP3 cho Gemini - bang Edge-TTS (audio-24khz-48kbitrate-mono-mp3)
+    GEMINI_MP3_BITRATE = '48k'
+
+    # So ket qua chia chunk giu lai (preview doi giong/toc do tren cung 1 text)
+    SPLIT_CACHE_SIZE = 32
+
     # Map ten giong UI sang API format
     UI_TO_GEMINI_VOICE = {
         "Aoede (Nu - Sang)": "gemini-Aoede",
@@ -102,31 +394,63 @@ class TextToSpeech:
         "vi-VN-NamMinhNeural (Nam)": "vi-VN-NamMinhNeural",
     }
 
+    # Bang tra cuu gop - 1 lan lookup cho _convert_voice / _is_gemini_voice
+    _UI_TO_API = {**UI_TO_GEMINI_VOICE, **UI_TO_EDGE_VOICE}
+    _GEMINI_NAMES = frozenset(GEMINI_VOICES) | frozenset(UI_TO_GEMINI_VOICE)
+
     def __init__(self, temp_dir: Path = None):
         if temp_dir:
             self.temp_dir = Path(temp_dir)
         else:
             self.temp_dir = Path(__file__).parent.parent.parent / "temp"
         self.temp_dir.mkdir(exist_ok=True)
+        # Prefix string cho file tam - khong tao Path moi cho moi chunk
+        self._temp_prefix = str(self.temp_dir) + os.sep
 
         # Initialize parallel processing components
         self.parallel_processor = None
         self.chunked_processor = ChunkedProcessor()
 
+        # Cache audio Edge-TTS - bo qua goi API cho text da tao truoc do
+        self.cache = TTSCache.for_dir(self.temp_dir / "_tts_cache")
+
+        # Cache ket qua chia chunk theo text (LRU, SPLIT_CACHE_SIZE entry)
+        self._split_cache = OrderedDict()
+        self._split_lock = threading.Lock()
+
+        # Thread pool dung chung de chay event loop rieng khi dang o trong async context
+        # (tao khi can, dung lai cho moi chunk - khong tao/huy thread moi lan goi)
+        self._tts_executor = None
+        self._executor_lock = threading.Lock()
+
+        # 1 event loop nen (daemon thread) cho cac lan goi Edge-TTS don le
+        # - khong tao/dong loop moi cho moi chunk, dung chung connector (DNS cache)
+        self._bg_loop = None
+        self._bg_connector = None
+
+        # Gemini client dung lai giua cac lan goi (theo API key)
+        self._gemini_client = None
+        self._gemini_client_key = None
+
+        # Kiem tra 1 lan luc khoi tao: co dang chay trong event loop khong?
+        # (Caller async nen dung agenerate())
+        try:
+            asyncio.get_running_loop()
+            self._in_async_context = True
+        except RuntimeError:
+            self._in_async_context = False
+
     def _convert_voice(self, voice: str) -> str:
         """Convert ten giong tu UI sang API format"""
-        if voice in self.UI_TO_GEMINI_VOICE:
-            return self.UI_TO_GEMINI_VOICE[voice]
-        if voice in self.UI_TO_EDGE_VOICE:
-            return self.UI_TO_EDGE_VOICE[voice]
-        return voice
+        return self._UI_TO_API.get(voice, voice)
 
     def _is_gemini_voice(self, voice: str) -> bool:
         """Check if voice is Gemini voice"""
-        return voice.startswith("gemini-") or voice in self.UI_TO_GEMINI_VOICE
+        return voice in self._GEMINI_NAMES or voice.startswith("gemini-")
 
     def generate(self, text: str, voice: str = "vi-VN-HoaiMyNeural",
-                 speed: float = 1.0, progress_callback=None) -> str:
+                 speed: float = 1.0, progress_callback=None,
+                 output_format: str = "mp3") -> str:
         """
         Tao audio tu text - ho tro nhieu engine TTS
 
@@ -135,9 +459,12 @@ class TextToSpeech:
             voice: ID giong doc (edge-tts, gtts-vi, gemini-X)
             speed: Toc do (0.5 - 2.0)
             progress_callback: Callback(progress: int)
+            output_format: "mp3" hoac "wav". "wav" bo qua buoc encode MP3 cua Gemini
+                (dung khi audio se duoc FFmpeg encode lai, vd. ghep vao video).
+                Edge-TTS/gTTS luon tra ve MP3.
 
         Returns:
-            Duong dan file audio MP3
+            Duong dan file audio (MP3 hoac WAV)
         """
         if not text or not text.strip():
             raise ValueError("Text khong duoc de trong!")
@@ -154,7 +481,8 @@ class TextToSpeech:
 
         # 1. Gemini TTS (Google AI - MIEN PHI)
         if voice.startswith("gemini-"):
-            return self._generate_gemini(text, voice, speed, progress_callback)
+            return self._generate_gemini(text, voice, speed, progress_callback,
+                                         output_format=output_format)
 
         # 2. gTTS (Google TTS)
         if voice.startswith("gtts"):
@@ -165,13 +493,12 @@ class TextToSpeech:
             raise Exception("edge-tts chua duoc cai dat. Chay: pip install edge-tts")
 
         # Validate Edge-TTS voice
-        if voice not in self.VOICES and not ('Neural' in voice):
+        if voice not in self._VOICE_KEYS and 'Neural' not in voice:
             print(f"[TTS] Giong {voice} khong hop le, dung mac dinh vi-VN-HoaiMyNeural")
             voice = "vi-VN-HoaiMyNeural"
 
         # Chuyen speed thanh rate string cho edge-tts
-        rate_percent = int((speed - 1.0) * 100)
-        rate = f"+{rate_percent}%" if rate_percent >= 0 else f"{rate_percent}%"
+        rate = _speed_to_rate(speed)
 
         # Neu text ngan, tao truc tiep
         if len(text) <= self.MAX_CHUNK_SIZE:
@@ -181,18 +508,28 @@ class TextToSpeech:
         print(f"[TTS] Text dai, dang chia nho...")
         return self._generate_long_text(text, voice, rate, progress_callback)
 
+    async def agenerate(self, text: str, voice: str = "vi-VN-HoaiMyNeural",
+                        speed: float = 1.0, progress_callback=None,
+                        output_format: str = "mp3") -> str:
+        """Ban async cua generate() - chay o thread rieng, khong chan event loop cua caller"""
+        return await asyncio.to_thread(
+            self.generate, text, voice, speed, progress_callback, output_format
+        )
+
     def _generate_gemini(self, text: str, voice: str, speed: float,
-                         progress_callback=None, api_key: str = None) -> str:
+                         progress_callback=None, api_key: str = None,
+                         output_format: str = "mp3", output_path: Optional[str] = None) -> str:
         """
         Tao audio bang Gemini TTS (Google AI - MIEN PHI)
         AUTO FALLBACK sang Edge TTS neu Gemini khong kha dung
-        """
-        import wave
 
+        output_path: ghi thang vao file nay (mac dinh: ten ngau nhien trong temp_dir)
+        """
         # AUTO FALLBACK: Neu google-genai chua cai dat, dung Edge TTS
         if genai is None:
             print("[Gemini TTS] google-genai chua cai dat - AUTO FALLBACK sang Edge TTS")
-            return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback)
+            return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback,
+                                         output_path=output_path)
 
         if progress_callback:
             progress_callback(5)
@@ -204,7 +541,8 @@ class TextToSpeech:
         # AUTO FALLBACK: Neu chua co API key, dung Edge TTS
         if not api_key:
             print("[Gemini TTS] Chua co API key - AUTO FALLBACK sang Edge TTS")
-            return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback)
+            return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback,
+                                         output_path=output_path)
 
         # Lay ten giong tu voice ID (gemini-Kore -> Kore)
         voice_name = voice.replace("gemini-", "")
@@ -215,92 +553,67 @@ class TextToSpeech:
             progress_callback(10)
 
         try:
-            # Khoi tao client voi API key
-            client = genai.Client(api_key=api_key)
+            # Dung lai client neu cung API key - khong dung lai channel/auth moi lan
+            client = self._get_gemini_client(api_key)
 
             if progress_callback:
                 progress_callback(20)
 
-            # Tao prompt voi huong dan toc do
-            speed_instruction = ""
-            if speed < 0.8:
-                speed_instruction = "Read very slowly and clearly: "
-            elif speed < 1.0:
-                speed_instruction = "Read slowly: "
-            elif speed > 1.3:
-                speed_instruction = "Read quickly: "
-            elif speed > 1.1:
-                speed_instruction = "Read at a slightly faster pace: "
-
-            full_prompt = f"{speed_instruction}{text}"
-
-            print(f"[Gemini TTS] Dang goi API...")
-
-            # Goi Gemini TTS API
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-preview-tts",
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=voice_name,
-                            )
-                        )
-                    ),
-                )
-            )
+            if len(text) <= self.MAX_CHUNK_SIZE:
+                print(f"[Gemini TTS] Dang goi API...")
+                audio_data = self._gemini_one_chunk(client, text, voice_name, speed)
+            else:
+                # Text dai - chia chunk, goi API song song, noi PCM trong RAM
+                audio_data = self._gemini_many_chunks(client, text, voice_name, speed)
 
             if progress_callback:
-                progress_callback(70)
-
-            # Lay du lieu audio (PCM)
-            audio_data = response.candidates[0].content.parts[0].inline_data.data
-
-            # Luu file WAV
-            wav_path = str(self.temp_dir / f"tts_gemini_{uuid.uuid4().hex[:8]}.wav")
+                progress_callback(85)
 
-            with wave.open(wav_path, "wb") as wf:
-                wf.setnchannels(1)      # Mono
-                wf.setsampwidth(2)      # 16-bit
-                wf.setframerate(24000)  # 24kHz
-                wf.writeframes(audio_data)
+            if output_format == "wav":
+                # Ghi WAV = header 44 byte + PCM, KHONG goi FFmpeg
+                wav_path = output_path or f"{self._temp_prefix}tts_gemini_{os.urandom(4).hex()}.wav"
+                with open(wav_path, "wb") as f:
+                    f.write(_wav_header(len(audio_data)))
+                    f.write(audio_data)
 
-            if progress_callback:
-                progress_callback(85)
+                if progress_callback:
+                    progress_callback(100)
 
-            # Chuyen sang MP3
-            mp3_path = str(self.temp_dir / f"tts_gemini_{uuid.uuid4().hex[:8]}.mp3")
+                print(f"[Gemini TTS] Thanh cong (WAV): {wav_path}")
+                return wav_path
 
+            # Chuyen PCM sang MP3 - PIPE vao/ra FFmpeg, kiem tra kich thuoc trong RAM
+            # roi moi ghi file (khong ghi WAV tam, khong stat file output)
+            # Cung dinh dang voi Edge-TTS (24kHz mono CBR 48k, khong ID3/Xing) -> segment
+            # Gemini va segment Edge fallback noi frame truc tiep, khong encode lai khi ghep
             cmd = [
-                'ffmpeg', '-y',
-                '-i', wav_path,
+                'ffmpeg', '-v', 'error',
+                '-f', 's16le',    # PCM 16-bit
+                '-ar', '24000',   # 24kHz
+                '-ac', '1',       # Mono
+                '-i', 'pipe:0',
                 '-c:a', 'libmp3lame',
-                '-b:a', '192k',
-                mp3_path
+                '-b:a', self.GEMINI_MP3_BITRATE,
+                '-write_xing', '0', '-id3v2_version', '0',
+                '-f', 'mp3', 'pipe:1'
             ]
 
-            subprocess.run(
-                cmd, capture_output=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-
-            # Xoa file WAV tam
-            try:
-                os.remove(wav_path)
-            except:
-                pass
+            mp3_data, error = _ffmpeg_pipe(cmd, audio_data)
+            if error:
+                print(f"[Gemini TTS] FFmpeg loi: {error[:200]}")
 
             if progress_callback:
                 progress_callback(100)
 
-            if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 1000:
-                print(f"[Gemini TTS] Thanh cong: {mp3_path}")
-                return mp3_path
-            else:
+            if error or len(mp3_data) <= 1000:
                 raise Exception("Gemini TTS khong tao duoc audio!")
 
+            mp3_path = output_path or f"{self._temp_prefix}tts_gemini_{os.urandom(4).hex()}.mp3"
+            with open(mp3_path, 'wb') as f:
+                f.write(mp3_data)
+            print(f"[Gemini TTS] Thanh cong: {mp3_path}")
+            return mp3_path
+
         except Exception as e:
             error_msg = str(e)
             print(f"[Gemini TTS] Loi: {error_msg}")
@@ -308,13 +621,87 @@ class TextToSpeech:
             # AUTO FALLBACK sang Edge-TTS cho TAT CA loi (bao gom ca API key)
             print("[Gemini TTS] AUTO FALLBACK sang Edge-TTS...")
             try:
-                return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback)
+                return self._generate_single(text, "vi-VN-HoaiMyNeural", "+0%", progress_callback,
+                                             output_path=output_path)
             except Exception as fallback_error:
                 # Neu Edge TTS cung fail, moi raise exception
                 raise Exception(f"Gemini TTS va Edge TTS deu loi. Gemini: {error_msg}, Edge: {str(fallback_error)}")
 
-    def _generate_gtts(self, text: str, speed: float, progress_callback=None) -> str:
-        """Tao audio bang Google TTS (gTTS)"""
+    def _get_gemini_client(self, api_key: str):
+        """genai.Client cache theo API key"""
+        if self._gemini_client is None or self._gemini_client_key != api_key:
+            self._gemini_client = genai.Client(api_key=api_key)
+            self._gemini_client_key = api_key
+        return self._gemini_client
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _gemini_config(voice_name: str):
+        """Config TTS cho 1 giong - tao 1 lan, dung lai cho moi request"""
+        return types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=voice_name,
+                    )
+                )
+            ),
+        )
+
+    def _gemini_one_chunk(self, client, text: str, voice_name: str, speed: float) -> bytes:
+        """Goi Gemini TTS cho 1 doan text, tra ve PCM 24kHz mono 16-bit"""
+        # Tao prompt voi huong dan toc do
+        full_prompt = f"{_speed_instruction(speed)}{text}"
+
+        # Goi Gemini TTS API
+        response = client.models.generate_content(
+            model="gemini-2.5-flash-preview-tts",
+            contents=full_prompt,
+            config=self._gemini_config(voice_name)
+        )
+
+        # Lay du lieu audio (PCM)
+        return response.candidates[0].content.parts[0].inline_data.data
+
+    def _gemini_many_chunks(self, client, text: str, voice_name: str, speed: float) -> bytes:
+        """
+        Text dai: gui request Gemini dong thoi tren event loop nen (toi da GEMINI_MAX_WORKERS)
+
+        PCM cung dinh dang nen noi bytes la du - chi encode 1 lan sau do.
+        """
+        chunks = self._split_text(text)
+        print(f"[Gemini TTS] Text dai: {len(chunks)} chunks, toi da {self.GEMINI_MAX_WORKERS} request dong thoi")
+
+        instruction = _speed_instruction(speed)
+        config = self._gemini_config(voice_name)
+
+        async def _all() -> List[bytes]:
+            sem = asyncio.Semaphore(self.GEMINI_MAX_WORKERS)
+
+            async def _one(chunk: str) -> bytes:
+                async with sem:
+                    response = await client.aio.models.generate_content(
+                        model="gemini-2.5-flash-preview-tts",
+                        contents=f"{instruction}{chunk}",
+                        config=config
+                    )
+                return response.candidates[0].content.parts[0].inline_data.data
+
+            return await asyncio.gather(*(_one(chunk) for chunk in chunks))
+
+        # client.aio giu pool HTTP gan voi loop dau tien -> luon chay tren loop nen cua instance,
+        # khong dung asyncio.run (moi lan 1 loop moi)
+        future = asyncio.run_coroutine_threadsafe(_all(), self._get_bg_loop())
+        try:
+            return b''.join(future.result())
+        except BaseException:
+            future.cancel()
+            raise
+
+    def _generate_gtts(self, text: str, speed: float, progress_callback=None,
+                       output_path: Optional[str] = None) -> str:
+        """Tao audio bang Google TTS (gTTS), ghi vao output_path neu co"""
         try:
             from gtts import gTTS
         except ImportError:
@@ -323,7 +710,8 @@ class TextToSpeech:
         if progress_callback:
             progress_callback(10)
 
-        output_path = str(self.temp_dir / f"tts_gtts_{uuid.uuid4().hex[:8]}.mp3")
+        if not output_path:
+            output_path = f"{self._temp_prefix}tts_gtts_{os.urandom(4).hex()}.mp3"
 
         print("[TTS] Dang tao audio bang gTTS...")
 
@@ -339,10 +727,10 @@ class TextToSpeech:
         return output_path
 
     def _generate_single(self, text: str, voice: str, rate: str,
-                         progress_callback=None) -> str:
+                         progress_callback=None, output_path: Optional[str] = None) -> str:
         """Tao audio cho text ngan"""
-        output_filename = f"tts_{uuid.uuid4().hex[:8]}.mp3"
-        output_path = str(self.temp_dir / output_filename)
+        if not output_path:
+            output_path = f"{self._temp_prefix}tts_{os.urandom(4).hex()}.mp3"
 
         if progress_callback:
             progress_callback(10)
@@ -354,10 +742,10 @@ class TextToSpeech:
             try:
                 self._run_async_tts(text, voice, rate, output_path)
 
-                if not os.path.exists(output_path):
+                try:
+                    file_size = os.stat(output_path).st_size
+                except OSError:
                     raise Exception("Khong tao duoc file audio!")
-
-                file_size = os.path.getsize(output_path)
                 if file_size < 1000:
                     raise Exception("File audio qua nho!")
 
@@ -379,155 +767,355 @@ class TextToSpeech:
 
     def _generate_long_text(self, text: str, voice: str, rate: str,
                             progress_callback=None) -> str:
-        """Tao audio cho text dai - XU LY TUAN TU DE DAM BAO KHONG BO SOT"""
-        import time
-
-        # Chia text thanh cac chunk
-        chunks = self._split_text(text)
-        total_chunks = len(chunks)
-
-        print(f"[TTS] Text dai: {len(text)} ky tu, chia thanh {total_chunks} chunks")
-        print(f"[TTS] XU LY TUAN TU de dam bao khong bo sot bat ky doan nao")
-
-        # Tao danh sach output paths theo thu tu
-        session_id = uuid.uuid4().hex[:6]
-        chunk_paths = []
-        for i in range(total_chunks):
-            chunk_filename = f"tts_chunk_{session_id}_{i:04d}.mp3"
-            chunk_paths.append(str(self.temp_dir / chunk_filename))
+        """
+        Tao audio cho text dai - 1 EVENT LOOP, CAC CHUNK CHAY DONG THOI, GHEP DUNG THU TU
 
-        # XU LY TUAN TU - KHONG SONG SONG de dam bao khong bo sot
-        successful_files = []
+        Chia cau (CPU) va goi Edge-TTS (network) chay chong len nhau:
+        chunk dau tien duoc gui di ngay khi tach xong, khong doi chia het text.
+        Chunk nao xong (va moi chunk truoc no da xong) duoc ghi ngay vao file output
+        - khong tao file chunk, khong buoc ghep, khong giu ca file trong bo nho.
+        """
+        print(f"[TTS] Text dai: {len(text)} ky tu")
+        print(f"[TTS] XU LY DONG THOI toi da {self.LONG_TEXT_CONCURRENCY} chunks tren 1 event loop")
 
+        # Edge-TTS luon tra frame MP3 thuan (khong ID3/Xing, cung 1 dinh dang)
+        # -> noi byte theo thu tu chunk la ra file hop le
+        final_output_path = f"{self._temp_prefix}tts_{os.urandom(4).hex()}.mp3"
         try:
-            for i, chunk_text in enumerate(chunks):
-                output_path = chunk_paths[i]
-                print(f"[TTS] Dang xu ly chunk {i+1}/{total_chunks} ({len(chunk_text)} ky tu)...")
+            with open(final_output_path, 'wb') as out:
+                results = self._run_coroutine(
+                    self._generate_many_async(
+                        self._iter_chunks(text), voice, rate, out,
+                        total_chars=len(text), progress_callback=progress_callback
+                    )
+                )
+            total_chunks = len(results)
+            print(f"[TTS] Da chia thanh {total_chunks} chunks")
 
-                # RETRY TOI DA 5 LAN cho moi chunk
-                success = False
-                for attempt in range(5):
-                    try:
-                        if attempt > 0:
-                            wait_time = 1.0 + attempt * 0.5
-                            print(f"[TTS] Chunk {i+1}: Retry lan {attempt + 1}, doi {wait_time:.1f}s...")
-                            time.sleep(wait_time)
-
-                        # Thu voi voice duoc chon truoc
-                        self._run_async_tts(chunk_text, voice, rate, output_path)
-
-                        if os.path.exists(output_path) and os.path.getsize(output_path) > 500:
-                            print(f"[TTS] Chunk {i+1}/{total_chunks}: OK ({os.path.getsize(output_path) / 1024:.1f} KB)")
-                            successful_files.append(output_path)
-                            success = True
-                            break
-                        else:
-                            raise Exception("File audio khong hop le")
-
-                    except Exception as e:
-                        print(f"[TTS] Chunk {i+1}: Loi '{e}'")
-
-                        # Sau 2 lan that bai, thu voi Edge TTS (stable hon)
-                        if attempt >= 2:
-                            print(f"[TTS] Chunk {i+1}: Thu voi Edge TTS...")
-                            try:
-                                self._run_async_tts(chunk_text, "vi-VN-HoaiMyNeural", "+0%", output_path)
-                                if os.path.exists(output_path) and os.path.getsize(output_path) > 500:
-                                    print(f"[TTS] Chunk {i+1}: THANH CONG voi Edge TTS!")
-                                    successful_files.append(output_path)
-                                    success = True
-                                    break
-                            except Exception as edge_error:
-                                print(f"[TTS] Chunk {i+1}: Edge TTS cung fail: {edge_error}")
-
-                # Neu chunk nay that bai hoan toan, BAO LOI NGAY
-                if not success:
-                    raise Exception(f"Chunk {i+1}/{total_chunks} THAT BAI sau 5 lan retry! Dung xu ly.")
-
-                # Update progress
-                if progress_callback:
-                    progress = int(((i + 1) / total_chunks) * 85) + 10
-                    progress_callback(progress)
+            # Neu co chunk that bai hoan toan, BAO LOI (khong bo sot doan nao)
+            for i, result in enumerate(results):
+                if isinstance(result, BaseException):
+                    raise Exception(f"Chunk {i+1}/{total_chunks} THAT BAI sau 5 lan retry! Dung xu ly. ({result})")
 
-            # Kiem tra ket qua
-            if len(successful_files) != total_chunks:
-                raise Exception(f"Chi tao duoc {len(successful_files)}/{total_chunks} chunks!")
+            print(f"[TTS] Da tao THANH CONG {total_chunks}/{total_chunks} chunks")
+
+            # Kiem tra kich thuoc = tong byte da ghi (khong can stat file)
+            output_size = sum(results)
+            if output_size < 1000:
+                raise Exception("Ghep file audio that bai!")
+        except BaseException:
+            try:
+                os.unlink(final_output_path)
+            except OSError:
+                pass
+            raise
 
-            print(f"[TTS] Da tao THANH CONG {len(successful_files)}/{total_chunks} chunks")
+        print(f"[TTS] HOAN THANH: {output_size / 1024:.1f} KB")
 
-            # Ghep tat ca chunk thanh 1 file
-            if progress_callback:
-                progress_callback(90)
+        if progress_callback:
+            progress_callback(100)
 
-            output_filename = f"tts_{uuid.uuid4().hex[:8]}.mp3"
-            final_output_path = str(self.temp_dir / output_filename)
+        return final_output_path
 
-            print(f"[TTS] Dang ghep {len(successful_files)} file audio...")
-            self._concat_audio_files(successful_files, final_output_path)
+    async def _generate_many_async(self, chunks: Iterable[str], voice: str, rate: str,
+                                   out, total_chars: int = 0, progress_callback=None) -> list:
+        """
+        Producer/consumer tren 1 event loop: producer lay chunk tu iterator (chia cau
+        chay trong thread), LONG_TEXT_CONCURRENCY worker goi Edge-TTS.
+        Audio duoc ghi vao `out` dung thu tu ngay khi doan dau lien tuc da xong.
 
-            # Kiem tra file output
-            if not os.path.exists(final_output_path) or os.path.getsize(final_output_path) < 1000:
-                raise Exception("Ghep file audio that bai!")
+        Returns:
+            List theo dung thu tu chunk: so byte da ghi hoac Exception
+        """
+        queue = asyncio.Queue(maxsize=self.LONG_TEXT_CONCURRENCY * 2)
+        results = {}
+        # Chunk xong som hon thu tu - cho den luot ghi
+        pending = {}
+        next_write = 0
+        done_chars = 0
+        last_percent = -1
+        sentinel = object()
+
+        # Fallback giong mac dinh - bo qua neu trung voi giong dang dung (goi lai y het)
+        fallback = ("vi-VN-HoaiMyNeural", "+0%")
+        use_fallback = (voice, rate) != fallback
+
+        # Dem loi/thanh cong ca lan chay: Edge-TTS loi hang loat -> cat retry,
+        # khong de moi chunk ngu het 5 lan backoff
+        ok_count = 0
+        fail_count = 0
+
+        async def _with_retry(i: int, chunk_text: str) -> bytes:
+            nonlocal ok_count, fail_count
+            last_error = None
+            # RETRY TOI DA 5 LAN cho moi chunk (2 lan khi dich vu dang loi hang loat)
+            for attempt in range(5):
+                degraded = fail_count > 3 and fail_count > 2 * ok_count
+                if attempt > 0:
+                    if degraded and attempt >= 2:
+                        raise Exception(f"Edge-TTS dang loi lien tuc, dung retry: {last_error}")
+                    # Exponential backoff: 0.5s, 1s, 2s, 4s (chi 0.5s khi dang loi hang loat)
+                    wait_time = 0.5 if degraded else 0.5 * (2 ** (attempt - 1))
+                    logger.debug("[TTS] Chunk %d: Retry lan %d, doi %.1fs...", i + 1, attempt + 1, wait_time)
+                    await asyncio.sleep(wait_time)
+                try:
+                    # Thu voi voice duoc chon truoc
+                    data = await self._edge_bytes_async(chunk_text, voice, rate, connector)
+                    break
+                except Exception as e:
+                    last_error = e
+                    fail_count += 1
+                    logger.warning("[TTS] Chunk %d: Loi '%s'", i + 1, e)
+
+                    # Sau 2 lan that bai (hoac ngay khi dang loi hang loat), thu voi giong mac dinh
+                    if use_fallback and (attempt >= 2 or degraded):
+                        logger.debug("[TTS] Chunk %d: Thu voi Edge TTS...", i + 1)
+                        try:
+                            data = await self._edge_bytes_async(chunk_text, *fallback, connector)
+                            logger.debug("[TTS] Chunk %d: THANH CONG voi Edge TTS!", i + 1)
+                            break
+                        except Exception as edge_error:
+                            logger.warning("[TTS] Chunk %d: Edge TTS cung fail: %s", i + 1, edge_error)
+            else:
+                raise Exception(f"File audio khong hop le: {last_error}")
+
+            ok_count += 1
+            fail_count = max(0, fail_count - 1)
+            logger.debug("[TTS] Chunk %d: OK (%.1f KB)", i + 1, len(data) / 1024)
+            return data
+
+        async def producer():
+            it = iter(chunks)
+            i = 0
+            while True:
+                chunk_text = await asyncio.to_thread(next, it, sentinel)
+                if chunk_text is sentinel:
+                    break
+                await queue.put((i, chunk_text))
+                i += 1
+            for _ in range(self.LONG_TEXT_CONCURRENCY):
+                await queue.put(None)
+
+        def _flush_ready():
+            nonlocal next_write
+            while next_write in pending:
+                out.write(pending.pop(next_write))
+                next_write += 1
+
+        async def worker():
+            nonlocal done_chars, last_percent
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                i, chunk_text = item
+                try:
+                    data = await _with_retry(i, chunk_text)
+                    results[i] = len(data)
+                    pending[i] = data
+                    _flush_ready()
+                except Exception as e:
+                    results[i] = e
+                done_chars += len(chunk_text)
+                if progress_callback and total_chars:
+                    # Chi bao khi % thay doi - callback UI chay tren event loop
+                    percent = int(min(done_chars / total_chars, 1.0) * 80) + 10
+                    if percent != last_percent:
+                        last_percent = percent
+                        progress_callback(percent)
+
+        # 1 connector cho ca lan chay - dung lai DNS cache va TCP pool giua cac chunk
+        connector = new_shared_connector()
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(self.LONG_TEXT_CONCURRENCY)))
+        finally:
+            if connector is not None:
+                await connector.aclose()
+        return [results[i] for i in range(len(results))]
+
+    async def _edge_bytes_async(self, text: str, voice: str, rate: str,
+                                connector=None) -> bytes:
+        """Tao audio 1 chunk Edge-TTS vao bo nho (co cache) va kiem tra ket qua"""
+        cache_key = TTSCache.make_key(text, voice, rate)
+        # Doc/ghi cache la IO disk -> chay ngoai event loop
+        data = await asyncio.to_thread(self.cache.get_bytes, cache_key)
+        if data is not None:
+            return data
+
+        if connector is not None:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, connector=connector)
+        else:
+            communicate = edge_tts.Communicate(text, voice, rate=rate)
+
+        buffer = bytearray()
+        async for message in communicate.stream():
+            if message["type"] == "audio":
+                buffer += message["data"]
+
+        if len(buffer) <= 500:
+            raise Exception("File audio khong hop le")
+        data = bytes(buffer)
+        await asyncio.to_thread(self.cache.put_bytes, cache_key, data, voice, rate)
+        return data
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Thread pool dung chung cua instance (tao lan dau can dung)"""
+        if self._tts_executor is None:
+            with self._executor_lock:
+                if self._tts_executor is None:
+                    self._tts_executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=8, thread_name_prefix='tts'
+                    )
+        return self._tts_executor
 
-            print(f"[TTS] HOAN THANH: {os.path.getsize(final_output_path) / 1024:.1f} KB")
+    def _get_bg_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop nen cua instance (khoi dong lan dau can dung)"""
+        if self._bg_loop is None:
+            with self._executor_lock:
+                if self._bg_loop is None:
+                    loop = asyncio.new_event_loop()
 
-            if progress_callback:
-                progress_callback(100)
+                    def _run():
+                        asyncio.set_event_loop(loop)
+                        try:
+                            loop.run_forever()
+                        finally:
+                            loop.close()
+
+                    threading.Thread(target=_run, name='tts-loop', daemon=True).start()
+                    self._bg_loop = loop
+        return self._bg_loop
+
+    async def _generate_on_bg_loop(self, text: str, voice: str, rate: str, output_path: str):
+        """Chay tren loop nen - connector tao 1 lan trong loop va dung lai"""
+        if self._bg_connector is None:
+            self._bg_connector = new_shared_connector()
+        await self._generate_async(text, voice, rate, output_path, self._bg_connector)
+
+    def close(self):
+        """Giai phong thread pool va event loop nen (khong doi task dang chay)"""
+        executor, self._tts_executor = self._tts_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+        loop, self._bg_loop = self._bg_loop, None
+        if loop is not None and not loop.is_closed():
+            connector, self._bg_connector = self._bg_connector, None
+
+            async def _shutdown():
+                if connector is not None:
+                    await connector.aclose()
+                loop.stop()
+
+            loop.call_soon_threadsafe(loop.create_task, _shutdown())
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
 
-            return final_output_path
+    def _run_coroutine(self, coro):
+        """Chay coroutine tu code sync - dung thread rieng neu dang o trong event loop"""
+        if not self._in_async_context:
+            return asyncio.run(coro)
 
-        finally:
-            # Xoa file chunk tam
-            for path in chunk_paths:
-                try:
-                    if os.path.exists(path):
-                        os.unlink(path)
-                except:
-                    pass
+        return self._get_executor().submit(asyncio.run, coro).result()
 
     def _split_text(self, text: str) -> List[str]:
         """Chia text thanh cac chunk nho"""
+        chunks = list(self._iter_chunks(text))
+        return chunks if chunks else [text]
+
+    def _iter_chunks(self, text: str) -> Iterator[str]:
+        """Generator chia chunk (co cache LRU theo text)"""
+        with self._split_lock:
+            cached = self._split_cache.get(text)
+            if cached is not None:
+                self._split_cache.move_to_end(text)
+        if cached is not None:
+            yield from cached
+            return
+
         chunks = []
-        current_chunk = ""
+        for chunk in self._iter_chunks_uncached(text):
+            chunks.append(chunk)
+            yield chunk
+
+        with self._split_lock:
+            self._split_cache[text] = tuple(chunks)
+            if len(self._split_cache) > self.SPLIT_CACHE_SIZE:
+                self._split_cache.popitem(last=False)
+
+    def _iter_chunks_uncached(self, text: str) -> Iterator[str]:
+        """Generator chia chunk - yield ngay tung chunk de gui TTS som"""
+        # Gom cac cau vao list + dem do dai, chi join khi xong 1 chunk (O(N))
+        current_parts = []
+        current_len = 0
+        produced = False
 
         sentences = self._split_sentences(text)
 
         for sentence in sentences:
             if len(sentence) > self.MAX_CHUNK_SIZE:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    current_chunk = ""
-                sub_chunks = self._split_long_sentence(sentence)
-                chunks.extend(sub_chunks)
+                if current_parts:
+                    yield "".join(current_parts)
+                    produced = True
+                    current_parts, current_len = [], 0
+                for sub_chunk in self._split_long_sentence(sentence):
+                    yield sub_chunk
+                    produced = True
                 continue
 
-            if len(current_chunk) + len(sentence) > self.MAX_CHUNK_SIZE:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
+            if current_len + len(sentence) > self.MAX_CHUNK_SIZE:
+                if current_parts:
+                    yield "".join(current_parts)
+                    produced = True
+                current_parts, current_len = [sentence], len(sentence)
             else:
-                current_chunk += sentence
+                current_parts.append(sentence)
+                current_len += len(sentence)
 
-        if current_chunk:
-            chunks.append(current_chunk)
-
-        return chunks if chunks else [text]
+        if current_parts:
+            yield "".join(current_parts)
+        elif not produced:
+            yield text
 
     def _split_sentences(self, text: str) -> List[str]:
         """Chia text thanh cac cau"""
-        pattern = r'([.!?。！？\n])'
-        parts = re.split(pattern, text)
+        if text.isascii():
+            return self._split_sentences_ascii(text)
+
+        # Text co dau cau CJK/tieng Viet: re.split (C) nhanh hon str.translate
+        # voi chuoi non-ASCII, nen chi ASCII moi di duong translate o tren
+        parts = _SENT_SPLIT.split(text)
+        parts.append('')
+
+        # parts = [cau, dau, cau, dau, ..., cau, ''] -> ghep tung cap (cau, dau cau)
+        sentences = [
+            sentence
+            for sentence in map(operator.add, parts[0::2], parts[1::2])
+            if sentence and not sentence.isspace()
+        ]
 
+        return sentences if sentences else [text]
+
+    def _split_sentences_ascii(self, text: str) -> List[str]:
+        """Chia cau cho text ASCII - khong dung regex, tim dau cau bang bytes.find"""
+        marks = text.encode('ascii').translate(_ASCII_DELIM_TABLE)
         sentences = []
-        i = 0
-        while i < len(parts):
-            sentence = parts[i]
-            if i + 1 < len(parts) and re.match(pattern, parts[i + 1]):
-                sentence += parts[i + 1]
-                i += 1
+        start = 0
+        pos = marks.find(1)
+        while pos != -1:
+            sentence = text[start:pos + 1]
             if sentence.strip():
                 sentences.append(sentence)
-            i += 1
+            start = pos + 1
+            pos = marks.find(1, start)
+
+        tail = text[start:]
+        if tail.strip():
+            sentences.append(tail)
 
         return sentences if sentences else [text]
 
@@ -535,20 +1123,21 @@ class TextToSpeech:
         """Chia cau dai thanh cac phan nho"""
         chunks = []
 
-        sub_pattern = r'([,，;；:])'
-        parts = re.split(sub_pattern, sentence)
+        parts = _SUB_SPLIT.split(sentence)
 
-        current = ""
+        current_parts = []
+        current_len = 0
         for part in parts:
-            if len(current) + len(part) > self.MAX_CHUNK_SIZE:
-                if current:
-                    chunks.append(current)
-                current = part
+            if current_len + len(part) > self.MAX_CHUNK_SIZE:
+                if current_parts:
+                    chunks.append("".join(current_parts))
+                current_parts, current_len = [part], len(part)
             else:
-                current += part
+                current_parts.append(part)
+                current_len += len(part)
 
-        if current:
-            chunks.append(current)
+        if current_parts:
+            chunks.append("".join(current_parts))
 
         # Cat cung neu van con qua dai
         final_chunks = []
@@ -561,187 +1150,49 @@ class TextToSpeech:
 
         return final_chunks if final_chunks else [sentence]
 
-    def _concat_audio_files(self, input_files: List[str], output_path: str):
-        """Ghep nhieu file audio thanh 1 file bang FFmpeg - FIX CHO WINDOWS"""
-        if len(input_files) == 1:
-            import shutil
-            shutil.copy(input_files[0], output_path)
-            return
-
-        # Neu chi co 2-3 files, dung crossfade de muot hon
-        if len(input_files) <= 3:
-            self._concat_with_crossfade(input_files, output_path)
+    def _run_async_tts(self, text: str, voice: str, rate: str, output_path: str):
+        """Chay async TTS voi timeout tang - CACHE HIT thi khong goi API"""
+        cache_key = TTSCache.make_key(text, voice, rate)
+        if self.cache.get(cache_key, output_path):
+            logger.debug("[TTS Cache] HIT: %d ky tu", len(text))
             return
 
-        # Neu nhieu files, dung concat thong thuong (nhanh hon)
-        list_filename = f"concat_list_{uuid.uuid4().hex[:8]}.txt"
-        list_path = str(self.temp_dir / list_filename)
-
-        print(f"[TTS] Ghep {len(input_files)} file audio...")
-
-        try:
-            with open(list_path, 'w', encoding='utf-8') as f:
-                for file_path in input_files:
-                    # QUAN TRONG: Tren Windows, phai dung forward slash / hoac escape backslash
-                    # FFmpeg concat demuxer can forward slash
-                    normalized_path = file_path.replace('\\', '/')
-                    f.write(f"file '{normalized_path}'\n")
-
-            cmd = [
-                'ffmpeg', '-y',
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', list_path,
-                '-c:a', 'libmp3lame',
-                '-b:a', '192k',
-                output_path
-            ]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-
-            # Kiem tra ket qua
-            if result.returncode != 0:
-                error_msg = result.stderr.decode() if result.stderr else "Unknown error"
-                print(f"[TTS] FFmpeg concat error: {error_msg}")
-                # Fallback: Thu ghep tung file mot
-                self._concat_sequential(input_files, output_path)
-            elif not os.path.exists(output_path) or os.path.getsize(output_path) < 1000:
-                print(f"[TTS] Concat output invalid, trying sequential merge...")
-                self._concat_sequential(input_files, output_path)
-            else:
-                print(f"[TTS] Concat thanh cong: {os.path.getsize(output_path) / 1024:.1f} KB")
-
-        finally:
-            try:
-                if os.path.exists(list_path):
-                    os.unlink(list_path)
-            except:
-                pass
-
-    def _concat_sequential(self, input_files: List[str], output_path: str):
-        """Ghep file tuan tu - FALLBACK khi concat list fail"""
-        import shutil
-
-        print(f"[TTS] Fallback: Ghep {len(input_files)} file tuan tu...")
-
-        # Ghep tung cap file mot
-        temp_output = None
-        current_input = input_files[0]
-
-        for i, next_file in enumerate(input_files[1:], 1):
-            temp_output = str(self.temp_dir / f"concat_temp_{i}.mp3")
-
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', current_input,
-                '-i', next_file,
-                '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1[out]',
-                '-map', '[out]',
-                '-c:a', 'libmp3lame',
-                '-b:a', '192k',
-                temp_output
-            ]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-
-            if result.returncode != 0:
-                print(f"[TTS] Sequential concat {i} failed: {result.stderr.decode()[:200]}")
-                # Neu fail, copy file hien tai
-                if os.path.exists(current_input):
-                    shutil.copy(current_input, output_path)
-                return
-
-            # Xoa temp truoc do (neu khong phai file goc)
-            if i > 1 and os.path.exists(current_input) and 'concat_temp' in current_input:
-                try:
-                    os.unlink(current_input)
-                except:
-                    pass
-
-            current_input = temp_output
-            print(f"[TTS] Ghep {i}/{len(input_files)-1} xong")
+        self._run_async_tts_uncached(text, voice, rate, output_path)
 
-        # Copy ket qua cuoi cung
-        if temp_output and os.path.exists(temp_output):
-            shutil.copy(temp_output, output_path)
-            try:
-                os.unlink(temp_output)
-            except:
-                pass
-            print(f"[TTS] Sequential concat hoan thanh: {os.path.getsize(output_path) / 1024:.1f} KB")
+        if looks_like_mp3(output_path):
+            self.cache.put(cache_key, output_path, voice, rate)
 
-    def _concat_with_crossfade(self, input_files: List[str], output_path: str):
-        """Ghep audio voi crossfade 50ms de giong muot hon"""
-        if len(input_files) == 2:
-            # 2 files: crossfade truc tiep
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', input_files[0],
-                '-i', input_files[1],
-                '-filter_complex', '[0][1]acrossfade=d=0.05:c1=tri:c2=tri',
-                '-c:a', 'libmp3lame', '-b:a', '192k',
-                output_path
-            ]
-        else:
-            # 3 files: crossfade tung cap
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', input_files[0],
-                '-i', input_files[1],
-                '-i', input_files[2],
-                '-filter_complex',
-                '[0][1]acrossfade=d=0.05:c1=tri:c2=tri[a01];[a01][2]acrossfade=d=0.05:c1=tri:c2=tri',
-                '-c:a', 'libmp3lame', '-b:a', '192k',
-                output_path
-            ]
+    def _run_async_tts_uncached(self, text: str, voice: str, rate: str, output_path: str):
+        """Goi Edge-TTS that su"""
+        timeout_seconds = self._tts_timeout(text)
 
-        subprocess.run(
-            cmd,
-            capture_output=True,
-            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        # Gui coroutine sang event loop nen (dung duoc ca khi caller dang o trong event loop)
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate_on_bg_loop(text, voice, rate, output_path), self._get_bg_loop()
         )
-
-    def _run_async_tts(self, text: str, voice: str, rate: str, output_path: str):
-        """Chay async TTS voi timeout tang"""
-        import concurrent.futures
-
-        # Tang timeout cho text dai hon
+        try:
+            future.result(timeout=timeout_seconds)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise asyncio.TimeoutError(f"Edge-TTS qua {timeout_seconds}s")
+
+    @staticmethod
+    def _tts_timeout(text: str) -> int:
+        """Tang timeout cho text dai hon"""
         text_length = len(text)
         if text_length > 400:
-            timeout_seconds = 120  # 2 phut cho text dai
+            return 120  # 2 phut cho text dai
         elif text_length > 200:
-            timeout_seconds = 90   # 1.5 phut cho text vua
-        else:
-            timeout_seconds = 60   # 1 phut cho text ngan
-
-        try:
-            loop = asyncio.get_running_loop()
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(self._run_in_new_loop, text, voice, rate, output_path)
-                future.result(timeout=timeout_seconds)
-        except RuntimeError:
-            asyncio.run(self._generate_async(text, voice, rate, output_path))
+            return 90   # 1.5 phut cho text vua
+        return 60       # 1 phut cho text ngan
 
-    def _run_in_new_loop(self, text: str, voice: str, rate: str, output_path: str):
-        """Chay trong event loop moi"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(self._generate_async(text, voice, rate, output_path))
-        finally:
-            loop.close()
-
-    async def _generate_async(self, text: str, voice: str, rate: str, output_path: str):
+    async def _generate_async(self, text: str, voice: str, rate: str, output_path: str,
+                              connector=None):
         """Async function tao audio"""
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
+        if connector is not None:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, connector=connector)
+        else:
+            communicate = edge_tts.Communicate(text, voice, rate=rate)
         await communicate.save(output_path)
 
     def generate_parallel(
@@ -799,70 +1250,97 @@ class TextToSpeech:
         # Gemini TTS: 6 workers song song - NHANH NHAT
         # Edge TTS: 10 workers song song
         voice_converted = self._convert_voice(voice)
-        is_gemini = voice_converted.startswith("gemini-")
+        engine = self._resolve_engine(voice_converted)
+        is_gemini = engine == "gemini"
+        # Edge-TTS chi la I/O mang -> moi segment chay tren event loop nen, khong can thread pool
+        is_edge = engine == "edge"
 
         if is_gemini:
             # Gemini TTS - TOI UU: 6 workers song song
             adaptive_workers = 6
             print(f"[TTS Parallel] Gemini TTS - XU LY SONG SONG (6 workers) cho {total_segments} segments")
+        elif is_edge:
+            adaptive_workers = self.EDGE_SEGMENT_CONCURRENCY
+            print(f"[TTS Parallel] Edge-TTS - XU LY DONG THOI ({adaptive_workers} request, 1 event loop) cho {total_segments} segments")
         else:
-            # Edge-TTS - TOI UU: 10 workers song song
+            # gTTS - 10 workers song song
             adaptive_workers = 10
-            print(f"[TTS Parallel] Edge-TTS - XU LY SONG SONG (10 workers) cho {total_segments} segments")
-
-        self.parallel_processor = ParallelProcessor(max_workers=adaptive_workers)
+            print(f"[TTS Parallel] gTTS - XU LY SONG SONG (10 workers) cho {total_segments} segments")
 
-        # Prepare rate string for edge-tts
-        rate_percent = int((speed - 1.0) * 100)
-        rate = f"+{rate_percent}%" if rate_percent >= 0 else f"{rate_percent}%"
+        # Prepare rate string for edge-tts, va he so toc do tuong ung cho Gemini/gTTS
+        # (tinh 1 lan cho ca batch, segment khong parse lai rate moi lan thu)
+        rate = _speed_to_rate(speed)
+        rate_speed = float(rate.rstrip('%')) / 100.0 + 1.0
 
         # Step 3: Create tasks for each segment
-        tasks = []
-        segment_paths = []
-
         # TOI UU TOC DO: Giam retry de xu ly nhanh hon
         # Gemini: 1 retry (fallback nhanh), Edge: 3 retries
         max_retries_per_segment = 1 if is_gemini else 3
 
         # Tao session ID chung de dam bao thu tu khi ghep
-        session_id = uuid.uuid4().hex[:6]
-
-        for i, segment in enumerate(segments):
-            # Format: tts_seg_SESSION_INDEX.mp3 - KHONG dung UUID rieng de dam bao thu tu
-            segment_path = str(self.temp_dir / f"tts_seg_{session_id}_{i:04d}.mp3")
-            segment_paths.append(segment_path)
-
-            task = Task(
-                id=f"segment_{i}",
-                func=self._generate_segment_with_retry,
-                args=(segment, i, total_segments),
-                kwargs={
-                    "voice": voice,
-                    "rate": rate,
-                    "output_path": segment_path,
-                    "max_retries": max_retries_per_segment
-                },
-                priority=i  # Process in order
-            )
-            tasks.append(task)
-
-        # Step 4: Set up progress callback wrapper
-        if progress_callback:
-            def progress_wrapper(completed, total, task_id, result, error=None):
-                if error:
-                    if status_callback:
-                        status_callback(f"Loi tai {task_id}: {error}")
-                else:
-                    if status_callback:
-                        status_callback(f"Dang tao giong {completed}/{total}...")
-                progress_callback(completed, total, task_id, result)
+        session_id = os.urandom(4).hex()
+
+        # Format: tts_seg_SESSION_INDEX.mp3 - KHONG dung UUID rieng de dam bao thu tu
+        segment_paths = [
+            f"{self._temp_prefix}tts_seg_{session_id}_{i:04d}.mp3" for i in range(total_segments)
+        ]
+
+        def make_tasks():
+            # Task tao dan khi worker ranh - khong dung san ca danh sach
+            for i, segment in enumerate(segments):
+                yield Task(
+                    id=f"segment_{i}",
+                    func=self._generate_segment_with_retry,
+                    args=(segment, i, total_segments),
+                    kwargs={
+                        # Giong da convert sang API 1 lan - segment khong convert lai
+                        "voice": voice_converted,
+                        "rate": rate,
+                        "speed": rate_speed,
+                        "engine": engine,
+                        "output_path": segment_paths[i],
+                        "max_retries": max_retries_per_segment
+                    },
+                    priority=i
+                )
 
-            self.parallel_processor.set_progress_callback(progress_wrapper)
+        # Step 4: Ghep NGAY khi cac segment dau da xong (chay nen, song song voi TTS)
+        output_path = f"{self._temp_prefix}tts_{session_id}.mp3"
+        merger = StreamingAudioMerger(
+            output_path, total_segments, self.chunked_processor,
+            add_silence=add_silence, silence_duration=silence_duration
+        )
 
-        # Step 5: Run parallel processing
-        results = self.parallel_processor.run_parallel(tasks)
+        # Step 5: Set up progress callback wrapper - bao merger moi khi 1 segment xong
+        def progress_wrapper(completed, total, task_id, result, error=None):
+            merger.add(int(task_id.rsplit('_', 1)[1]), result if isinstance(result, str) else None)
+            if not progress_callback:
+                return
+            if error:
+                if status_callback:
+                    status_callback(f"Loi tai {task_id}: {error}")
+            else:
+                if status_callback:
+                    status_callback(f"Dang tao giong {completed}/{total}...")
+            progress_callback(completed, total, task_id, result)
 
-        # Step 6: Check for errors - cho phep mot so segments that bai
+        # Step 6: Run parallel processing
+        try:
+            if is_edge:
+                results = self._run_edge_segments(
+                    segments, total_segments, voice_converted, rate, segment_paths,
+                    max_retries_per_segment, progress_wrapper
+                )
+            else:
+                # Nop task theo thu tu segment -> merger ghi duoc ngay tu doan dau
+                self.parallel_processor = ParallelProcessor(max_workers=adaptive_workers)
+                self.parallel_processor.set_progress_callback(progress_wrapper)
+                results = self.parallel_processor.run_incremental(make_tasks(), total_segments)
+        except BaseException:
+            merger.abort()
+            raise
+
+        # Step 7: Check for errors - cho phep mot so segments that bai
         errors = [task_id for task_id, result in results.items() if isinstance(result, dict) and "error" in result]
         total_segments_count = len(segment_paths)
         failed_count = len(errors)
@@ -877,17 +1355,131 @@ class TextToSpeech:
                 error_msg = f"Qua nhieu segments that bai ({failed_count}/{total_segments_count}): {', '.join(errors[:5])}..."
                 if status_callback:
                     status_callback(error_msg)
+                merger.abort()
                 raise Exception(error_msg)
 
-        # Step 7: Verify all segments - QUAN TRONG: Giu dung thu tu 0, 1, 2, 3...
+        if status_callback:
+            status_callback("Dang ghep cac doan audio...")
+
+        # Step 8: Doi merger xong - neu khac dinh dang thi ghep lai bang ffmpeg
+        if merger.finish():
+            print(f"[TTS Parallel] Da ghep {total_segments_count - failed_count} segments trong luc tao giong")
+        else:
+            self._merge_segment_files(segment_paths, session_id, output_path, add_silence, silence_duration)
+
+        # Step 9: Cleanup segment files
+        _remove_prefix(str(self.temp_dir), f"tts_seg_{session_id}_")
+
+        if status_callback:
+            status_callback("Hoan thanh!")
+
+        if progress_callback:
+            progress_callback(total_segments, total_segments, "final", output_path)
+
+        print(f"[TTS Parallel] Hoan thanh: {output_path}")
+        return output_path
+
+    def _run_edge_segments(self, segments: Iterable[str], total: int, voice: str, rate: str,
+                           segment_paths: List[str], max_retries: int,
+                           progress_callback: Callable) -> dict:
+        """
+        Tao tat ca segment Edge-TTS tren event loop nen (gather + Semaphore)
+
+        Ket qua va callback giong ParallelProcessor.run_parallel: {"segment_i": path | {"error": ...}}.
+        """
+        if edge_tts is None:
+            raise Exception("edge-tts chua duoc cai dat. Chay: pip install edge-tts")
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._edge_segments_async(segments, total, voice, rate, segment_paths, max_retries,
+                                      progress_callback),
+            self._get_bg_loop()
+        )
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _edge_segments_async(self, segments: Iterable[str], total: int, voice: str, rate: str,
+                                   segment_paths: List[str], max_retries: int,
+                                   progress_callback: Callable) -> dict:
+        """
+        Coroutine cua _run_edge_segments - chay tren loop nen, dung chung connector
+
+        Worker lay segment tu iterator theo thu tu, chi ~2x EDGE_SEGMENT_CONCURRENCY
+        coroutine ton tai cung luc thay vi 1 coroutine cho moi segment.
+        """
+        if self._bg_connector is None:
+            self._bg_connector = new_shared_connector()
+        connector = self._bg_connector
+        sem = asyncio.Semaphore(self.EDGE_SEGMENT_CONCURRENCY)
+        pending = enumerate(segments)
+        results = {}
+
+        async def _one(i: int, text: str):
+            delay = 0.2
+            error = None
+            for attempt in range(max_retries):
+                # Cho backoff ngoai semaphore - khong giu slot cua segment khac
+                if attempt > 0:
+                    delay = _backoff(delay, 0.2, 4.0)
+                    logger.debug("[TTS] Segment %d: Retry %d, waiting %.1fs...", i, attempt + 1, delay)
+                    await asyncio.sleep(delay)
+                try:
+                    async with sem:
+                        data = await asyncio.wait_for(
+                            self._edge_bytes_async(text, voice, rate, connector),
+                            self._tts_timeout(text)
+                        )
+                    with open(segment_paths[i], 'wb') as f:
+                        f.write(data)
+                    return segment_paths[i]
+                except Exception as e:
+                    error = e
+                    logger.warning("[TTS] Segment %d: Loi '%s'", i, e)
+                    # Loi tham so (sai giong, sai rate...) retry cung vo ich
+                    if isinstance(e, ValueError):
+                        break
+
+            logger.warning("[TTS] Segment %d: THAT BAI sau %d lan", i, max_retries)
+            return {"error": f"Segment {i + 1}/{total} failed: {error}"}
+
+        async def _run(i: int, text: str):
+            result = await _one(i, text)
+            task_id = f"segment_{i}"
+            results[task_id] = result
+            progress_callback(len(results), total, task_id, result)
+
+        async def worker():
+            # Worker dang backoff khong giu slot semaphore -> nhieu worker hon slot
+            for i, text in pending:
+                await _run(i, text)
+
+        workers = min(self.EDGE_SEGMENT_CONCURRENCY * 2, total)
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+    def _merge_segment_files(self, segment_paths: List[str], session_id: str, output_path: str,
+                             add_silence: bool, silence_duration: float):
+        """Ghep segment bang ffmpeg - FALLBACK khi khong noi frame truc tiep duoc"""
+        # Verify all segments - QUAN TRONG: Giu dung thu tu 0, 1, 2, 3...
+        # File ton tai lay tu 1 lan scandir; file co mat thi doc 4 byte dau kiem tra
+        # header MP3 (file rac du lon van lam hong lenh concat cua ffmpeg)
+        sizes = _scan_prefix(str(self.temp_dir), f"tts_seg_{session_id}_")
         valid_segments = []  # List of (index, path)
         skipped_segments = []
         for i, segment_path in enumerate(segment_paths):
-            if os.path.exists(segment_path) and os.path.getsize(segment_path) > 500:
-                valid_segments.append((i, segment_path))  # Luu ca index de sort
-            else:
-                skipped_segments.append(i)
-                print(f"[TTS Parallel] Skipping segment {i} - file khong ton tai hoac qua nho")
+            if sizes.get(os.path.basename(segment_path)):
+                try:
+                    with open(segment_path, 'rb') as f:
+                        if is_mp3_head(f.read(4)):
+                            valid_segments.append((i, segment_path))  # Luu ca index de sort
+                            continue
+                except OSError:
+                    pass
+            skipped_segments.append(i)
+            logger.warning("[TTS Parallel] Skipping segment %d - file khong ton tai hoac khong phai MP3", i)
 
         if not valid_segments:
             raise Exception("Khong tao duoc bat ky segment audio nao!")
@@ -901,13 +1493,7 @@ class TextToSpeech:
         if skipped_segments:
             print(f"[TTS Parallel] Da bo qua {len(skipped_segments)} segments: {skipped_segments[:10]}...")
 
-        # Step 8: Merge audio chunks with silence
-        if status_callback:
-            status_callback("Dang ghep cac doan audio...")
-
-        output_filename = f"tts_{uuid.uuid4().hex[:8]}.mp3"
-        output_path = str(self.temp_dir / output_filename)
-
+        # Merge audio chunks with silence
         success = self.chunked_processor.merge_audio_chunks(
             valid_paths,
             output_path,
@@ -918,22 +1504,33 @@ class TextToSpeech:
         if not success:
             raise Exception("Khong the ghep cac doan audio!")
 
-        # Step 9: Cleanup segment files
-        for segment_path in segment_paths:
-            try:
-                if os.path.exists(segment_path):
-                    os.remove(segment_path)
-            except:
-                pass
+    # Engine -> ham tao 1 segment, cung chu ky (text, voice, rate, speed, output_path)
+    _SEGMENT_ENGINES = {
+        "gemini": "_segment_gemini",
+        "gtts": "_segment_gtts",
+        "edge": "_segment_edge",
+    }
 
-        if status_callback:
-            status_callback("Hoan thanh!")
+    @staticmethod
+    def _resolve_engine(voice: str) -> str:
+        """Engine cua giong (API format): "gemini", "gtts" hoac "edge" """
+        if voice.startswith("gemini-"):
+            return "gemini"
+        if voice.startswith("gtts"):
+            return "gtts"
+        return "edge"
 
-        if progress_callback:
-            progress_callback(total_segments, total_segments, "final", output_path)
+    def _segment_gemini(self, text: str, voice: str, rate: str, speed: float, output_path: str):
+        """1 segment Gemini - ghi thang vao output_path, khong move/copy file tam"""
+        self._generate_gemini(text, voice, speed, progress_callback=None, output_path=output_path)
 
-        print(f"[TTS Parallel] Hoan thanh: {output_path}")
-        return output_path
+    def _segment_gtts(self, text: str, voice: str, rate: str, speed: float, output_path: str):
+        """1 segment gTTS (gTTS chi co 1 giong, bo qua voice)"""
+        self._generate_gtts(text, speed, progress_callback=None, output_path=output_path)
+
+    def _segment_edge(self, text: str, voice: str, rate: str, speed: float, output_path: str):
+        """1 segment Edge-TTS (dung rate dang chuoi)"""
+        self._run_async_tts(text, voice, rate, output_path)
 
     def _generate_segment_with_retry(
         self,
@@ -943,7 +1540,9 @@ class TextToSpeech:
         voice: str,
         rate: str,
         output_path: str,
-        max_retries: int = 5
+        max_retries: int = 5,
+        engine: Optional[str] = None,
+        speed: Optional[float] = None
     ) -> str:
         """
         Generate TTS for a single segment with retry logic
@@ -952,71 +1551,43 @@ class TextToSpeech:
             segment_text: Text segment to convert
             segment_index: Index of this segment
             total_segments: Total number of segments
-            voice: Voice ID
+            voice: Voice ID (API format, already converted by the caller)
             rate: Speech rate
             output_path: Output file path
             max_retries: Maximum retry attempts (default: 5)
+            engine: "gemini" / "gtts" / "edge" precomputed by the caller (None -> resolve from voice)
+            speed: Speed multiplier matching rate, precomputed by the caller (None -> parse rate)
 
         Returns:
             str: Path to generated audio file
         """
-        import time
-        import random
-
-        # Convert voice from UI format to API format
-        voice = self._convert_voice(voice)
         last_error = None
 
-        # Xac dinh engine
-        is_gemini = voice.startswith("gemini-")
+        # Xac dinh engine 1 lan (caller da tinh san cho ca batch)
+        if engine is None:
+            engine = self._resolve_engine(voice)
+        is_gemini = engine == "gemini"
+        generate_segment = getattr(self, self._SEGMENT_ENGINES[engine])
+        if speed is None:
+            speed = float(rate.rstrip('%')) / 100.0 + 1.0
+
+        # Backoff theo engine: Gemini 0.5s -> 8s, Edge 0.2s -> 4s (decorrelated jitter)
+        base_delay, max_delay = (0.5, 8.0) if is_gemini else (0.2, 4.0)
+        delay = base_delay
 
         for attempt in range(max_retries):
             try:
-                # TOI UU TOC DO: Giam delay xuong muc toi thieu
+                # Request dau tien gui ngay - chi cho khi retry
                 if attempt > 0:
-                    # Retry delay: chi 1 giay cho moi attempt
-                    wait_time = 1.0 + random.uniform(0, 0.5)
-                    print(f"[TTS] Segment {segment_index}: Retry {attempt + 1}, waiting {wait_time:.1f}s...")
-                    time.sleep(wait_time)
-                else:
-                    # Delay request dau tien: TOI UU - chi 0.3-0.5s
-                    if is_gemini:
-                        time.sleep(random.uniform(0.3, 0.5))  # Gemini: 0.3-0.5s
-                    else:
-                        # Edge TTS: Delay cuc nho
-                        time.sleep(random.uniform(0.05, 0.1))  # Edge: 0.05-0.1s
+                    delay = _backoff(delay, base_delay, max_delay)
+                    logger.debug("[TTS] Segment %d: Retry %d, waiting %.1fs...", segment_index, attempt + 1, delay)
+                    time.sleep(delay)
 
                 # Generate audio for this segment
-                # Handle different TTS engines
-                if voice.startswith("gemini-"):
-                    # Extract speed from rate string
-                    rate_value = float(rate.rstrip('%')) / 100.0 + 1.0
-                    result_path = self._generate_gemini(
-                        segment_text,
-                        voice,
-                        rate_value,
-                        progress_callback=None
-                    )
-                    # Move to expected output path
-                    if result_path != output_path:
-                        import shutil
-                        shutil.move(result_path, output_path)
-                elif voice.startswith("gtts"):
-                    rate_value = float(rate.rstrip('%')) / 100.0 + 1.0
-                    result_path = self._generate_gtts(
-                        segment_text,
-                        rate_value,
-                        progress_callback=None
-                    )
-                    if result_path != output_path:
-                        import shutil
-                        shutil.move(result_path, output_path)
-                else:
-                    # Edge-TTS
-                    self._run_async_tts(segment_text, voice, rate, output_path)
+                generate_segment(segment_text, voice, rate, speed, output_path)
 
                 # Verify file was created
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 500:
+                if looks_like_mp3(output_path):
                     return output_path
                 else:
                     raise Exception("File audio khong hop le hoac qua nho!")
@@ -1024,53 +1595,63 @@ class TextToSpeech:
             except Exception as e:
                 last_error = e
                 error_msg = str(e)
-                print(f"[TTS] Segment {segment_index}: Loi '{error_msg}'")
+                logger.warning("[TTS] Segment %d: Loi '%s'", segment_index, error_msg)
 
-                if attempt < max_retries - 1:
+                # Loi tham so (sai giong, sai rate...) retry cung vo ich
+                if attempt < max_retries - 1 and not isinstance(e, ValueError):
                     continue
                 else:
                     # Final attempt failed - FALLBACK TO EDGE TTS
                     if is_gemini:
-                        print(f"[TTS] Segment {segment_index}: Gemini that bai sau {max_retries} lan - FALLBACK sang Edge TTS...")
+                        logger.warning("[TTS] Segment %d: Gemini that bai sau %d lan - FALLBACK sang Edge TTS...", segment_index, max_retries)
                         try:
                             # Fallback to Edge TTS with Vietnamese voice
                             fallback_voice = "vi-VN-HoaiMyNeural"
                             self._run_async_tts(segment_text, fallback_voice, rate, output_path)
 
                             # Verify fallback succeeded
-                            if os.path.exists(output_path) and os.path.getsize(output_path) > 500:
-                                print(f"[TTS] Segment {segment_index}: THANH CONG voi Edge TTS fallback!")
+                            if looks_like_mp3(output_path):
+                                logger.debug("[TTS] Segment %d: THANH CONG voi Edge TTS fallback!", segment_index)
                                 return output_path
                             else:
                                 raise Exception("Edge TTS fallback tao file khong hop le")
                         except Exception as fallback_error:
-                            print(f"[TTS] Segment {segment_index}: Edge TTS fallback cung that bai: {fallback_error}")
+                            logger.warning("[TTS] Segment %d: Edge TTS fallback cung that bai: %s", segment_index, fallback_error)
                             return {"error": f"Segment {segment_index + 1}/{total_segments} failed (Gemini + Edge fallback): {error_msg}"}
                     else:
                         # Edge TTS that bai - khong fallback
-                        print(f"[TTS] Segment {segment_index}: THAT BAI sau {max_retries} lan")
+                        logger.warning("[TTS] Segment %d: THAT BAI sau %d lan", segment_index, max_retries)
                         return {"error": f"Segment {segment_index + 1}/{total_segments} failed: {error_msg}"}
 
         # Should not reach here, but just in case
         if is_gemini:
             # Try Edge TTS fallback
-            print(f"[TTS] Segment {segment_index}: Gemini timeout - FALLBACK sang Edge TTS...")
+            logger.warning("[TTS] Segment %d: Gemini timeout - FALLBACK sang Edge TTS...", segment_index)
             try:
                 fallback_voice = "vi-VN-HoaiMyNeural"
                 self._run_async_tts(segment_text, fallback_voice, rate, output_path)
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 500:
-                    print(f"[TTS] Segment {segment_index}: THANH CONG voi Edge TTS fallback!")
+                if looks_like_mp3(output_path):
+                    logger.debug("[TTS] Segment %d: THANH CONG voi Edge TTS fallback!", segment_index)
                     return output_path
             except:
                 pass
         return {"error": f"Segment {segment_index + 1}/{total_segments} failed: {str(last_error)}"}
 
-    def get_available_voices(self) -> dict:
-        """Lay danh sach giong"""
-        return self.VOICES.copy()
+    def get_available_voices(self) -> Mapping[str, str]:
+        """Lay danh sach giong (read-only, khong copy dict)"""
+        return _VOICES_VIEW
+
+    @staticmethod
+    def list_edge_voices() -> tuple:
+        """Danh sach giong Edge-TTS tu server (goi network 1 lan, cache trong process)"""
+        return _list_edge_voices()
 
     def _get_audio_duration(self, audio_path: str) -> float:
-        """Lay thoi luong audio file bang FFprobe"""
+        """Lay thoi luong audio file - doc header MP3/WAV, chi goi FFprobe khi khong parse duoc"""
+        duration = read_audio_duration(audio_path)
+        if duration is not None:
+            return duration
+
         try:
             cmd = [
                 'ffprobe', '-v', 'quiet',
@@ -1079,9 +1660,19 @@ class TextToSpeech:
                 audio_path
             ]
             result = subprocess.run(
-                cmd, capture_output=True, text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                **_SUBPROCESS_KW
             )
             return float(result.stdout.strip())
         except:
             return 0.0
+
+
+_VOICES_VIEW = MappingProxyType(TextToSpeech.VOICES)
+
+
+@functools.lru_cache(maxsize=1)
+def _list_edge_voices() -> tuple:
+    if edge_tts is None:
+        return ()
+    return tuple(asyncio.run(edge_tts.list_voices()))
@@ -1,17 +1,103 @@
 """
 Module dich van ban - Ho tro nhieu provider voi fallback
 """
-import time
-import urllib.request
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import re
+import threading
+import time
 from typing import Optional
 
+import requests
+from requests.adapters import HTTPAdapter
+
+# Parse JSON truc tiep tu bytes; orjson nhanh hon neu co cai
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+
+class _TokenBucket:
+    """
+    Gioi han toc do goi 1 provider theo AIMD
+
+    Bi 429/503 -> giam toc do 1 nua; du nhieu lan thanh cong lien tiep -> tang gap doi.
+    """
+
+    MIN_RATE = 0.5          # request/giay
+    MAX_RATE = 20.0
+    RAISE_AFTER = 20        # so lan thanh cong lien tiep truoc khi tang toc
+
+    def __init__(self, rate: float = 10.0, capacity: float = 10.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.successes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Lay 1 token, cho neu bucket rong"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            if self.successes >= self.RAISE_AFTER:
+                self.rate = min(self.MAX_RATE, self.rate * 2)
+                self.successes = 0
+
+    def on_throttled(self):
+        with self._lock:
+            self.rate = max(self.MIN_RATE, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            self.successes = 0
+
 
 class Translator:
     """Dich van ban tu tieng Trung sang tieng Viet"""
 
+    # So chunk dich dong thoi moi provider (MyMemory gioi han quota -> tuan tu)
+    PROVIDER_WORKERS = {
+        "google_free": 4,
+        "google_web": 4,
+        "mymemory": 1,
+        "deep_google": 4,
+    }
+
+    # Tach cau theo dau cham Trung va Viet, nhom capture giu lai dau cham
+    _SPLIT_RE = re.compile(r'([。！？\.\!\?]+)')
+
+    # Phan loai loi theo HTTP status (khong tim chuoi trong message - URL chua text nguon)
+    # Bi chan / sai quyen -> bo provider
+    _UNRECOVERABLE_STATUS = frozenset({401, 403})
+    # Dang bi gioi han toc do
+    _THROTTLED_STATUS = frozenset({429, 503})
+
+    # Provider dich thanh cong trong khoang nay (giay) duoc thu truoc
+    RECENT_SUCCESS_WINDOW = 300
+    # Provider bi loi vinh vien duoc thu lai sau khoang nay (giay)
+    DEAD_PROVIDER_TTL = 1800
+
+    # Trang thai provider dung chung moi instance (worker tao Translator moi cho moi job):
+    # provider -> thoi diem bi loi vinh vien / thanh cong gan nhat (monotonic)
+    _dead_providers = {}
+    _last_success = {}
+    _state_lock = threading.Lock()
+    # Gioi han toc do rieng tung provider, chi siet lai khi bi 429/503
+    _buckets = {p: _TokenBucket() for p in PROVIDER_WORKERS}
+
     def __init__(self):
         # Thu tu uu tien cac provider
         self.providers = [
@@ -21,6 +107,54 @@ class Translator:
             "deep_google",      # deep-translator Google
         ]
 
+        # 1 session dung chung: giu ket noi keep-alive, khong bat tay TLS lai moi chunk
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+
+    def _provider_order(self) -> list:
+        """Provider con song, uu tien provider vua dich thanh cong gan day"""
+        now = time.monotonic()
+        with self._state_lock:
+            alive = [p for p in self.providers if not self._is_dead(p, now)]
+            last_success = dict(self._last_success)
+        # sort on dinh: provider cung nhom giu thu tu uu tien goc
+        return sorted(alive, key=lambda p: now - last_success.get(p, -1e9) > self.RECENT_SUCCESS_WINDOW)
+
+    def _is_dead(self, provider: str, now: float) -> bool:
+        """Provider con trong thoi gian bi bo qua (goi khi dang giu _state_lock)"""
+        dead_at = self._dead_providers.get(provider)
+        if dead_at is None:
+            return False
+        if now - dead_at > self.DEAD_PROVIDER_TTL:
+            del self._dead_providers[provider]
+            return False
+        return True
+
+    @staticmethod
+    def _http_status(exc: BaseException) -> Optional[int]:
+        """HTTP status cua loi (tim ca trong chuoi __cause__), None neu khong co response"""
+        while exc is not None:
+            status = getattr(getattr(exc, 'response', None), 'status_code', None)
+            if status is not None:
+                return status
+            exc = exc.__cause__
+        return None
+
+    @classmethod
+    def _is_unrecoverable(cls, exc: BaseException) -> bool:
+        """Loi khong the tu het khi thu lai: bi chan (401/403) hoac thieu thu vien"""
+        if cls._http_status(exc) in cls._UNRECOVERABLE_STATUS:
+            return True
+        while exc is not None:
+            if isinstance(exc, ImportError):
+                return True
+            exc = exc.__cause__
+        return False
+
     def translate(self, text: str, source: str = "zh-CN", target: str = "vi",
                   progress_callback=None, status_callback=None) -> str:
         """
@@ -34,20 +168,23 @@ class Translator:
         if progress_callback:
             progress_callback(10)
 
-        errors = []
+        providers = self._provider_order()
+        errors = [f"{p}: bo qua (loi truoc do)" for p in self.providers if p not in providers]
 
         # Thu tung provider
-        for i, provider in enumerate(self.providers):
+        for i, provider in enumerate(providers):
             try:
                 if status_callback:
                     status_callback(f"Dang dich voi {provider}...")
 
                 if progress_callback:
-                    progress_callback(10 + int((i / len(self.providers)) * 30))
+                    progress_callback(10 + int((i / len(providers)) * 30))
 
                 result = self._translate_with_provider(text, source, target, provider, status_callback)
 
                 if result and result.strip() and result.strip() != text.strip():
+                    with self._state_lock:
+                        self._last_success[provider] = time.monotonic()
                     if progress_callback:
                         progress_callback(100)
                     if status_callback:
@@ -58,6 +195,9 @@ class Translator:
                 error_msg = f"{provider}: {str(e)[:100]}"
                 errors.append(error_msg)
                 print(f"[Translator] {error_msg}")
+                if self._is_unrecoverable(e):
+                    with self._state_lock:
+                        self._dead_providers[provider] = time.monotonic()
                 continue
 
         # Tat ca provider loi
@@ -72,30 +212,50 @@ class Translator:
         # Chia text thanh cac chunk nho
         MAX_CHUNK = 4500
         chunks = self._split_text(text, MAX_CHUNK)
-        results = []
-
-        for idx, chunk in enumerate(chunks):
-            if status_callback and len(chunks) > 1:
-                status_callback(f"{provider}: Doan {idx+1}/{len(chunks)}...")
-
-            if provider == "google_free":
-                result = self._translate_google_free(chunk, source, target)
-            elif provider == "google_web":
-                result = self._translate_google_web(chunk, source, target)
-            elif provider == "mymemory":
-                result = self._translate_mymemory(chunk, source, target)
-            elif provider == "deep_google":
-                result = self._translate_deep_google(chunk, source, target)
-            else:
-                raise ValueError(f"Provider khong hop le: {provider}")
 
-            if result:
-                results.append(result)
+        translate_fn = {
+            "google_free": self._translate_google_free,
+            "google_web": self._translate_google_web,
+            "mymemory": self._translate_mymemory,
+            "deep_google": self._translate_deep_google,
+        }.get(provider)
+        if translate_fn is None:
+            raise ValueError(f"Provider khong hop le: {provider}")
 
-            # Delay nho giua cac chunk de tranh rate limit
-            if idx < len(chunks) - 1:
-                time.sleep(0.5)
+        bucket = self._buckets[provider]
 
+        def call(chunk):
+            bucket.acquire()
+            try:
+                result = translate_fn(chunk, source, target)
+            except Exception as e:
+                if self._http_status(e) in self._THROTTLED_STATUS:
+                    bucket.on_throttled()
+                raise
+            bucket.on_success()
+            return result
+
+        if len(chunks) == 1:
+            result = call(chunks[0])
+            return result if result else None
+
+        # Cac chunk doc lap -> dich song song, so luong gioi han theo provider
+        workers = min(self.PROVIDER_WORKERS.get(provider, 1), len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(call, chunk) for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception:
+                    # Chunk dau tien loi -> huy cac chunk chua chay, khong cho het roi moi raise
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                if status_callback:
+                    status_callback(f"{provider}: Doan {done}/{len(chunks)}...")
+            # Giu dung thu tu chunk
+            results = [future.result() for future in futures]
+
+        results = [result for result in results if result]
         return " ".join(results) if results else None
 
     def _translate_google_free(self, text: str, source: str, target: str) -> Optional[str]:
@@ -110,23 +270,20 @@ class Translator:
         # Google Translate API endpoint (free)
         url = f"https://translate.googleapis.com/translate_a/single?client=gtx&sl={src}&tl={tgt}&dt=t&q={encoded_text}"
 
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-
         try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                data = response.read().decode('utf-8')
-                result = json.loads(data)
-
-                # Extract translated text from response
-                if result and isinstance(result, list) and result[0]:
-                    translated_parts = []
-                    for part in result[0]:
-                        if part and len(part) > 0 and part[0]:
-                            translated_parts.append(part[0])
-                    return "".join(translated_parts)
+            response = self._session.get(url, timeout=30)
+            response.raise_for_status()
+            result = _json_loads(response.content)
+
+            # Extract translated text from response
+            if result and isinstance(result, list) and result[0]:
+                translated_parts = []
+                for part in result[0]:
+                    if part and len(part) > 0 and part[0]:
+                        translated_parts.append(part[0])
+                return "".join(translated_parts)
         except Exception as e:
-            raise Exception(f"Google Free API loi: {e}")
+            raise Exception(f"Google Free API loi: {e}") from e
 
         return None
 
@@ -144,22 +301,21 @@ class Translator:
         # Alternative Google endpoint
         url = f"https://clients5.google.com/translate_a/t?client=dict-chrome-ex&sl={src}&tl={tgt}&q={encoded_text}"
 
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0')
-
         try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                data = response.read().decode('utf-8')
-                result = json.loads(data)
-
-                # Format: [["translated text"]]
-                if result and isinstance(result, list):
-                    if isinstance(result[0], list):
-                        return result[0][0]
-                    elif isinstance(result[0], str):
-                        return result[0]
+            response = self._session.get(url, timeout=30, headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0'
+            })
+            response.raise_for_status()
+            result = _json_loads(response.content)
+
+            # Format: [["translated text"]]
+            if result and isinstance(result, list):
+                if isinstance(result[0], list):
+                    return result[0][0]
+                elif isinstance(result[0], str):
+                    return result[0]
         except Exception as e:
-            raise Exception(f"Google Web loi: {e}")
+            raise Exception(f"Google Web loi: {e}") from e
 
         return None
 
@@ -175,20 +331,17 @@ class Translator:
         encoded_text = urllib.parse.quote(text)
         url = f"https://api.mymemory.translated.net/get?q={encoded_text}&langpair={src}|{tgt}"
 
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0')
-
         try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                data = response.read().decode('utf-8')
-                result = json.loads(data)
-
-                if result.get('responseStatus') == 200:
-                    translated = result.get('responseData', {}).get('translatedText')
-                    if translated and translated.upper() != text.upper():
-                        return translated
+            response = self._session.get(url, timeout=30, headers={'User-Agent': 'Mozilla/5.0'})
+            response.raise_for_status()
+            result = _json_loads(response.content)
+
+            if result.get('responseStatus') == 200:
+                translated = result.get('responseData', {}).get('translatedText')
+                if translated and translated.upper() != text.upper():
+                    return translated
         except Exception as e:
-            raise Exception(f"MyMemory loi: {e}")
+            raise Exception(f"MyMemory loi: {e}") from e
 
         return None
 
@@ -199,10 +352,10 @@ class Translator:
             translator = GoogleTranslator(source=source, target=target)
             result = translator.translate(text)
             return result
-        except ImportError:
-            raise Exception("deep-translator chua cai")
+        except ImportError as e:
+            raise Exception("deep-translator chua cai") from e
         except Exception as e:
-            raise Exception(f"deep-translator loi: {e}")
+            raise Exception(f"deep-translator loi: {e}") from e
 
     def _split_text(self, text: str, max_length: int) -> list:
         """Chia text thanh cac chunk theo cau"""
@@ -210,30 +363,35 @@ class Translator:
             return [text]
 
         chunks = []
-        current_chunk = ""
+        # Gom cau vao list + dem do dai, chi join khi flush chunk
+        buf, buf_len = [], 0
 
         # Tach theo cac dau cham cau Trung va Viet
         # Giu nguyen dau cham trong chunk
-        sentences = re.split(r'([。！？\.\!\?]+)', text)
+        # split() co nhom capture -> phan tu le luon la dau cham, khong can match lai
+        sentences = self._SPLIT_RE.split(text)
 
         i = 0
         while i < len(sentences):
             sentence = sentences[i]
             # Ket hop cau voi dau cham cua no
-            if i + 1 < len(sentences) and re.match(r'^[。！？\.\!\?]+$', sentences[i + 1]):
+            if i + 1 < len(sentences):
                 sentence += sentences[i + 1]
                 i += 1
 
-            if len(current_chunk) + len(sentence) > max_length:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
+            slen = len(sentence)
+            if buf_len + slen > max_length:
+                if buf_len:
+                    chunks.append(''.join(buf).strip())
+                buf, buf_len = [sentence], slen
             else:
-                current_chunk += sentence
+                buf.append(sentence)
+                buf_len += slen
 
             i += 1
 
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        last_chunk = ''.join(buf).strip()
+        if last_chunk:
+            chunks.append(last_chunk)
 
         return chunks if chunks else [text]
@@ -20,24 +20,116 @@ import asyncio
 import aiohttp
 import aiofiles
 import concurrent.futures
+import contextlib
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import multiprocessing
 import threading
 import os
+import shutil
 import time
 import subprocess
 import uuid
+import wave
 import hashlib
-from typing import List, Callable, Any, Optional, Tuple, Dict
+import math
+import re
+from typing import List, Callable, Any, Optional, Tuple, Dict, Iterable, Awaitable
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
 
+from src.core.parallel_processor import join_overlapping_texts
+from src.utils.audio_info import copy_mp3_frames, probe_mp3, read_audio_duration
+from src.utils.edge_connector import new_shared_connector
+
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
 # Use all CPU cores aggressively
 MAX_WORKERS = multiprocessing.cpu_count() * 4  # Aggressive threading
 MAX_ASYNC_CONNECTIONS = 20  # Parallel API connections
-CHUNK_SIZE = 15  # Smaller chunks = more parallelism (seconds)
+CHUNK_SIZE = 15  # Minimum STT chunk (seconds) - long files use longer chunks
 BATCH_SIZE = 10  # Batch API calls
+GROQ_MAX_RETRIES = 3  # Attempts per chunk on 429/5xx/network errors
+MIN_RANGE_SIZE = 4 * 1024 * 1024  # Download range size - smaller ranges never leave TCP slow-start
+MAX_RANGE_CHUNKS = 16  # Parallel range requests per download
+TRANSLATE_CHUNK_CHARS = 4500  # Google gtx POST limit is ~5000 chars
+
+# Sentence boundaries for TTS segmentation
+_SENT_RE = re.compile(r'[。.!?！？\n]')
+
+
+def _new_session() -> aiohttp.ClientSession:
+    """ClientSession with a keep-alive pool - reuse it so Groq/CDN requests skip TLS handshakes"""
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+        limit=MAX_ASYNC_CONNECTIONS,
+        limit_per_host=MAX_ASYNC_CONNECTIONS,
+        ttl_dns_cache=300,
+        keepalive_timeout=30,
+    ))
+
+
+@contextlib.asynccontextmanager
+async def _session_scope(session: Optional[aiohttp.ClientSession]):
+    """Use the injected shared session, or a temporary one closed after the call"""
+    if session is not None and not session.closed:
+        yield session
+    else:
+        async with _new_session() as own_session:
+            yield own_session
+
+
+async def bounded_gather(coros: Iterable[Awaitable], limit: int = MAX_ASYNC_CONNECTIONS) -> list:
+    """
+    asyncio.gather(*coros, return_exceptions=True) with at most `limit` awaited at once
+
+    `limit` workers pull from the iterable lazily (pass a generator): no Task or
+    coroutine exists for items not yet started. Results keep input order.
+    """
+    results = {}
+    items = enumerate(coros)
+
+    async def worker():
+        for idx, coro in items:
+            try:
+                results[idx] = await coro
+            except Exception as e:
+                results[idx] = e
+
+    await asyncio.gather(*[worker() for _ in range(limit)])
+    return [results[i] for i in range(len(results))]
+
+
+def _remove_files(paths: List[str]):
+    """Xoa cac file tam, bo qua file khong ton tai"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def _remove_files_async(paths: List[str]):
+    """_remove_files in the default executor - 100+ unlink syscalls off the event loop"""
+    await asyncio.get_running_loop().run_in_executor(None, _remove_files, paths)
+
+
+class _ProgressThrottle:
+    """Limit progress updates (marshalled to the UI thread) to ~20/s; the last one always passes"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._last = 0.0
+
+    def ready(self, done: int, total: int) -> bool:
+        now = time.monotonic()
+        if done < total and now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
 
 
 @dataclass
@@ -53,19 +145,32 @@ class TurboTask:
 class TurboProcessor:
     """Ultra-fast parallel processor using all available resources"""
 
-    def __init__(self):
-        self.thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
-        self.process_pool = ProcessPoolExecutor(max_workers=multiprocessing.cpu_count())
-        self.semaphore = asyncio.Semaphore(MAX_ASYNC_CONNECTIONS)
-        self.cache = {}
+    def __init__(self, max_connections: int = MAX_ASYNC_CONNECTIONS):
+        # Pools are created on first use - STT/TTS only need the semaphore
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.cache = OrderedDict()  # LRU - oldest first, bounded by its users
         self.progress_callback = None
 
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=multiprocessing.cpu_count())
+        return self._process_pool
+
     async def run_async_parallel(self, tasks: List[TurboTask]) -> dict:
         """Run tasks with maximum async parallelism"""
         async with aiohttp.ClientSession() as session:
-            results = await asyncio.gather(
-                *[self._execute_async(task, session) for task in tasks],
-                return_exceptions=True
+            results = await bounded_gather(
+                (self._execute_async(task, session) for task in tasks),
+                MAX_ASYNC_CONNECTIONS
             )
         return {task.id: result for task, result in zip(tasks, results)}
 
@@ -77,51 +182,77 @@ class TurboProcessor:
             except Exception as e:
                 return {"error": str(e)}
 
-    def run_thread_parallel(self, tasks: List[TurboTask]) -> dict:
-        """Run CPU-bound tasks in parallel threads"""
-        futures = {
+    def run_io_parallel(self, tasks: List[TurboTask]) -> dict:
+        """Run I/O-bound tasks (subprocess, file, blocking HTTP) in parallel threads"""
+        return self._collect({
             self.thread_pool.submit(task.func, *task.args, **task.kwargs): task
             for task in tasks
-        }
+        })
+
+    def run_cpu_parallel(self, tasks: List[TurboTask]) -> dict:
+        """
+        Run CPU-bound Python tasks in separate processes (bypass GIL)
+
+        task.func and its arguments must be picklable (module-level functions, no lambdas).
+        """
+        return self._collect({
+            self.process_pool.submit(task.func, *task.args, **task.kwargs): task
+            for task in tasks
+        })
+
+    # Old names: threads only help I/O-bound work, processes CPU-bound work
+    run_thread_parallel = run_io_parallel
+    run_process_parallel = run_cpu_parallel
+
+    def _collect(self, futures: Dict[concurrent.futures.Future, TurboTask]) -> dict:
+        """Gather results by task id as they complete"""
         results = {}
+        throttle = _ProgressThrottle()
         for future in concurrent.futures.as_completed(futures):
             task = futures[future]
             try:
                 results[task.id] = future.result()
             except Exception as e:
                 results[task.id] = {"error": str(e)}
-            if self.progress_callback:
-                self.progress_callback(len(results), len(tasks))
-        return results
-
-    def run_process_parallel(self, tasks: List[TurboTask]) -> dict:
-        """Run heavy CPU tasks in separate processes (bypass GIL)"""
-        futures = {
-            self.process_pool.submit(task.func, *task.args, **task.kwargs): task
-            for task in tasks
-        }
-        results = {}
-        for future in concurrent.futures.as_completed(futures):
-            task = futures[future]
-            results[task.id] = future.result()
+            if self.progress_callback and throttle.ready(len(results), len(futures)):
+                self.progress_callback(len(results), len(futures))
         return results
 
     def shutdown(self):
         """Cleanup resources"""
-        self.thread_pool.shutdown(wait=False)
-        self.process_pool.shutdown(wait=False)
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
 
 
 class TurboSTT:
     """Ultra-fast Speech-to-Text with aggressive parallelism"""
 
     MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB - gioi han Groq
-
-    def __init__(self, api_key: str, temp_dir: str = "temp"):
+    MAX_BOUNDARY_WORDS = 12  # Longest repeat checked at a chunk seam (2s overlap)
+    MAX_CHUNK_SECONDS = int(MAX_FILE_SIZE * 0.9 / (16000 * 2))  # 16kHz mono s16 WAV under 25MB
+    CACHE_MEMORY_ENTRIES = 256  # Transcripts kept in processor.cache (LRU)
+    CACHE_DISK_ENTRIES = 2000   # .txt files kept in stt_cache (LRU by mtime)
+
+    def __init__(self, api_key: str, temp_dir: str = "temp",
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_concurrency: int = MAX_ASYNC_CONNECTIONS,
+                 processor: Optional[TurboProcessor] = None):
         self.api_key = api_key
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
-        self.processor = TurboProcessor()
+        # processor.semaphore bounds simultaneous Groq requests (max_concurrency)
+        self.processor = processor or TurboProcessor(max_connections=max_concurrency)
+        self.max_concurrency = max_concurrency
+        # Shared session (injected by TurboEngine); None -> one session per call
+        self.session = session
+        # Transcripts by audio content hash: processor.cache in memory, .txt files on disk
+        self.cache_dir = self.temp_dir / "stt_cache"
+        self.cache_dir.mkdir(exist_ok=True)
+        self._disk_entries: Optional[int] = None  # counted on first put
 
     async def transcribe_turbo(self, audio_path: str, progress_callback=None,
                                status_callback=None) -> str:
@@ -146,24 +277,63 @@ class TurboSTT:
         if status_callback:
             status_callback("[TURBO] File lon, chia chunks...")
 
-        # Split into small chunks for maximum parallelism
-        chunks = self._split_audio_aggressive(audio_path, chunk_duration=CHUNK_SIZE)
-        total_chunks = len(chunks)
+        # Pipeline: ffmpeg decodes into a PCM pipe while workers already upload the
+        # chunks cut so far (chunk 0 goes out long before the decode finishes)
+        chunk_duration, expected = self._plan_chunks(audio_path)
 
         if status_callback:
-            status_callback(f"[TURBO] Xu ly song song {total_chunks} chunks...")
+            status_callback(f"[TURBO] Xu ly song song ~{expected or '?'} chunks...")
 
         if progress_callback:
-            progress_callback(0, total_chunks, "Bat dau xu ly song song...")
+            progress_callback(0, max(expected, 1), "Bat dau xu ly song song...")
 
-        # Process ALL chunks in parallel (not limited!)
-        # IMPORTANT: asyncio.gather() preserves order, so results[i] = chunk i
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                self._transcribe_chunk_async(session, chunk, i, total_chunks, progress_callback, status_callback)
-                for i, chunk in enumerate(chunks)
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        workers = self.max_concurrency
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        chunk_results: Dict[int, str] = {}
+        chunks = []
+
+        async def produce():
+            try:
+                async for idx, chunk_path in self._stream_chunks(audio_path, chunk_duration=chunk_duration):
+                    chunks.append(chunk_path)
+                    await queue.put((idx, chunk_path))
+            finally:
+                for _ in range(workers):
+                    await queue.put(None)
+
+        throttle = _ProgressThrottle()
+
+        async def consume(session):
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                idx, chunk_path = item
+                chunk_results[idx] = await self._transcribe_chunk_async(session, chunk_path, idx)
+
+                # Completed count (not idx) so progress only moves forward
+                done, total = len(chunk_results), max(expected, len(chunks))
+                if throttle.ready(done, total):
+                    if progress_callback:
+                        progress_callback(done, total, f"Hoan thanh chunk {done}/{total}")
+                    if status_callback:
+                        status_callback(f"[TURBO] {done}/{total} chunks hoan thanh")
+
+        async with _session_scope(self.session) as session:
+            outcome = await asyncio.gather(
+                produce(), *[consume(session) for _ in range(workers)],
+                return_exceptions=True
+            )
+        if isinstance(outcome[0], Exception):
+            await _remove_files_async(chunks)
+            raise outcome[0]
+        if not chunk_results:
+            raise Exception("Khong tao duoc chunk audio nao!")
+        if progress_callback and expected > len(chunks):
+            # Estimate was high - the workers' last update was below 100%
+            progress_callback(len(chunks), len(chunks), f"Hoan thanh chunk {len(chunks)}/{len(chunks)}")
+
+        results = [chunk_results.get(i, "") for i in range(len(chunks))]
 
         # Merge results IN ORDER (gather preserves order!)
         print(f"[TURBO STT] Merging {len(results)} chunk results...")
@@ -196,157 +366,240 @@ class TurboSTT:
             raise Exception(f"Too many chunks failed! Only {len(transcription_parts)}/{len(results)} succeeded. Check API key and network.")
 
         # Merge with space, remove duplicate words at boundaries (from overlap)
-        transcription = " ".join(transcription_parts)
-        transcription = self._remove_boundary_duplicates(transcription)
+        transcription = self._remove_boundary_duplicates(transcription_parts)
 
-        # Cleanup chunks
-        for chunk in chunks:
-            try:
-                if os.path.exists(chunk):
-                    os.remove(chunk)
-            except:
-                pass
+        await _remove_files_async(chunks)
 
         if status_callback:
             status_callback(f"[TURBO] Hoan thanh! ({len(transcription)} ky tu)")
 
         return transcription
 
-    def _split_audio_aggressive(self, audio_path: str, chunk_duration: int = 15, overlap: float = 2.0) -> List[str]:
+    def _plan_chunks(self, audio_path: str, overlap: float = 2.0) -> Tuple[int, int]:
         """
-        Split audio into many small chunks for maximum parallelism
-        FIXED: Added overlap to prevent word cutting, proper coverage
+        (chunk_duration, expected chunk count) from the audio header
+
+        Chunks are sized so the whole file goes out in ~1 wave of max_concurrency
+        requests: 30 min -> 20 x 90s instead of 139 x 15s (every request pays Groq's
+        per-call overhead). Never below CHUNK_SIZE, never above what fits in 25MB of
+        16kHz mono WAV. Unknown duration -> CHUNK_SIZE, count 0.
         """
-        # Get duration
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-               '-of', 'default=noprint_wrappers=1:nokey=1', audio_path]
-        result = subprocess.run(cmd, capture_output=True, text=True,
-                                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-        duration = float(result.stdout.strip())
-
-        print(f"[TURBO STT] Total audio duration: {duration:.2f}s")
-        print(f"[TURBO STT] Chunk size: {chunk_duration}s, Overlap: {overlap}s")
+        duration = read_audio_duration(audio_path)
+        if not duration:
+            return CHUNK_SIZE, 0
+        chunk_duration = max(CHUNK_SIZE, min(self.MAX_CHUNK_SECONDS,
+                                             math.ceil(duration / self.max_concurrency + overlap)))
+        return chunk_duration, math.ceil(duration / (chunk_duration - overlap))
+
+    async def _stream_chunks(self, audio_path: str, chunk_duration: int = 15, overlap: float = 2.0):
+        """
+        Async generator of (idx, chunk_path) - overlapping chunks cut while ffmpeg decodes
+        FIXED: Added overlap to prevent word cutting, proper coverage
 
-        chunks = []
+        One ffmpeg process decodes/resamples the whole file to 16kHz mono PCM on stdout;
+        each chunk is written as soon as its samples have arrived, so uploads start while
+        the rest of the file is still being decoded. Only the current chunk is buffered.
+        """
         temp_dir = self.temp_dir / "stt_chunks"
         temp_dir.mkdir(exist_ok=True)
 
-        # Calculate positions for all chunks FIRST (ensure no gaps!)
-        chunk_positions = []
-        current_position = 0.0
+        rate = 16000
+        width = 2  # s16le mono
+        chunk_bytes = int(round(chunk_duration * rate)) * width
         effective_step = chunk_duration - overlap
-        idx = 0
-
-        while current_position < duration:
-            chunk_start = current_position
-            remaining = duration - chunk_start
-            this_duration = min(chunk_duration, remaining)
-            chunk_positions.append((chunk_start, this_duration, idx))
-            current_position += effective_step
-            idx += 1
-
-        print(f"[TURBO STT] Will create {len(chunk_positions)} chunks")
-
-        # Create ALL chunks in parallel using thread pool
-        def create_chunk(start, this_duration, idx):
-            chunk_path = str(temp_dir / f"chunk_{idx:04d}.wav")
-            chunk_end = start + this_duration
-
-            cmd = [
-                'ffmpeg', '-y',
-                '-ss', str(start),  # Start at exact position
-                '-i', audio_path,
-                '-t', str(this_duration),  # Take this duration
-                '-ar', '16000', '-ac', '1', '-f', 'wav',
-                chunk_path
-            ]
-            subprocess.run(cmd, capture_output=True,
-                           creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-
-            # Verify chunk was created
-            if os.path.exists(chunk_path) and os.path.getsize(chunk_path) > 100:
-                print(f"[TURBO STT] Chunk {idx}: {start:.2f}s - {chunk_end:.2f}s [OK]")
-                return chunk_path
-            else:
-                print(f"[TURBO STT] WARNING: Chunk {idx} at {start:.2f}s FAILED!")
-                return None
-
-        # Generate all chunks in parallel
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = [executor.submit(create_chunk, start, dur, idx)
-                      for start, dur, idx in chunk_positions]
-            chunks = [f.result() for f in futures if f.result() is not None]
-
-        print(f"[TURBO STT] Created {len(chunks)}/{len(chunk_positions)} chunks successfully")
-
-        # VERIFY: Calculate actual coverage
-        if chunk_positions:
-            first_chunk_start = chunk_positions[0][0]
-            last_chunk = chunk_positions[-1]
-            last_chunk_end = last_chunk[0] + last_chunk[1]
-            print(f"[TURBO STT] Coverage: {first_chunk_start:.2f}s - {last_chunk_end:.2f}s")
-            print(f"[TURBO STT] Video duration: {duration:.2f}s")
-
-            # Check for gaps
-            if first_chunk_start > 0.5:
-                print(f"[TURBO STT] WARNING: Missing beginning! First chunk starts at {first_chunk_start:.2f}s")
-
-            if last_chunk_end < duration - 0.5:
-                print(f"[TURBO STT] WARNING: Missing ending! Last chunk ends at {last_chunk_end:.2f}s, video ends at {duration:.2f}s")
-
-            coverage_percent = (last_chunk_end / duration * 100) if duration > 0 else 0
-            print(f"[TURBO STT] Coverage: {coverage_percent:.1f}% of video")
+        print(f"[TURBO STT] Chunk size: {chunk_duration}s, Overlap: {overlap}s")
 
-        return chunks
+        proc = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-v', 'error',
+            '-i', audio_path,
+            '-ar', str(rate), '-ac', '1', '-f', 's16le', 'pipe:1',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        # Drain stderr concurrently so ffmpeg never blocks on a full pipe
+        stderr_task = asyncio.ensure_future(proc.stderr.read())
 
-    def _remove_boundary_duplicates(self, text: str) -> str:
-        """
-        Remove duplicate words that appear at chunk boundaries due to overlap
-        Example: "hello world world goodbye" -> "hello world goodbye"
-        """
-        words = text.split()
-        if len(words) <= 1:
+        buf = bytearray()
+        buf_start = 0  # Byte offset of buf[0] in the PCM stream
+        pcm_bytes = 0
+        eof = False
+        idx = 0
+        try:
+            while True:
+                start = int(idx * effective_step * rate) * width
+                end = start + chunk_bytes
+                while not eof and buf_start + len(buf) < end:
+                    block = await proc.stdout.read(1 << 16)
+                    if block:
+                        buf += block
+                        pcm_bytes += len(block)
+                    else:
+                        eof = True
+
+                stream_end = min(end, pcm_bytes)
+                if start >= pcm_bytes:
+                    break
+
+                chunk_path = str(temp_dir / f"chunk_{idx:04d}.wav")
+                with wave.open(chunk_path, 'wb') as dst:
+                    dst.setnchannels(1)
+                    dst.setsampwidth(width)
+                    dst.setframerate(rate)
+                    dst.writeframes(buf[start - buf_start:stream_end - buf_start])
+
+                print(f"[TURBO STT] Chunk {idx}: {start / width / rate:.2f}s - "
+                      f"{stream_end / width / rate:.2f}s [OK]")
+                yield idx, chunk_path
+                idx += 1
+
+                # Drop the samples before the next chunk (overlap stays buffered)
+                next_start = int(idx * effective_step * rate) * width
+                del buf[:next_start - buf_start]
+                buf_start = next_start
+
+            await proc.wait()
+            stderr = await stderr_task
+            if proc.returncode != 0 and idx == 0:
+                raise Exception(f"Audio decode failed: {stderr.decode('utf-8', 'ignore')[:200]}")
+
+            duration = pcm_bytes / width / rate
+            print(f"[TURBO STT] Created {idx} chunks covering 0.00s - {duration:.2f}s")
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            stderr_task.cancel()
+
+    def _remove_boundary_duplicates(self, parts: List[str]) -> str:
+        """Join chunk transcripts, dropping the words repeated at each boundary due to overlap"""
+        text, removed = join_overlapping_texts(parts, self.MAX_BOUNDARY_WORDS)
+        print(f"[TURBO STT] Deduplication: removed {removed} boundary words ({len(text.split())} words)")
+        return text
+
+    @staticmethod
+    def _cache_key(audio_path: str, kind: str) -> str:
+        """blake2b of the audio bytes plus the request params that change the transcript"""
+        h = hashlib.blake2b(f"whisper-large-v3|zh|{kind}|".encode('utf-8'), digest_size=16)
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Transcript da cache (bo nho -> disk), None neu miss"""
+        cache = self.processor.cache
+        text = cache.get(key)
+        if text is not None:
+            cache.move_to_end(key)
             return text
-
-        cleaned = [words[0]]
-        for i in range(1, len(words)):
-            # Only add if different from previous word (case insensitive)
-            if words[i].lower() != words[i-1].lower():
-                cleaned.append(words[i])
-
-        result = " ".join(cleaned)
-        print(f"[TURBO STT] Deduplication: {len(words)} words -> {len(cleaned)} words")
-        return result
-
-    async def _transcribe_chunk_async(self, session, chunk_path, idx, total,
-                                      progress_callback, status_callback):
-        """Transcribe single chunk asynchronously"""
+        path = self.cache_dir / f"{key}.txt"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)  # mtime = last use -> disk LRU order
+        except OSError:
+            return None
+        self._memory_put(key, text)
+        return text
+
+    def _cache_put(self, key: str, text: str):
+        """Luu transcript vao cache (ghi file tam roi replace - khong de lai file do dang)"""
+        self._memory_put(key, text)
+        path = self.cache_dir / f"{key}.txt"
+        is_new = not path.exists()
+        tmp_path = self.cache_dir / f"{key}.{uuid.uuid4().hex[:8]}.tmp"
         try:
-            # Read chunk
-            async with aiofiles.open(chunk_path, 'rb') as f:
-                audio_data = await f.read()
-
-            # Call Groq API
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            data = aiohttp.FormData()
-            data.add_field('file', audio_data, filename='audio.wav', content_type='audio/wav')
-            data.add_field('model', 'whisper-large-v3')
-            data.add_field('language', 'zh')
-
-            async with session.post(
-                'https://api.groq.com/openai/v1/audio/transcriptions',
-                headers=headers,
-                data=data,
-                timeout=aiohttp.ClientTimeout(total=60)
-            ) as response:
-                result = await response.json()
-                text = result.get('text', '')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        if is_new:
+            self._trim_disk_cache()
+
+    def _memory_put(self, key: str, text: str):
+        cache = self.processor.cache
+        cache[key] = text
+        cache.move_to_end(key)
+        while len(cache) > self.CACHE_MEMORY_ENTRIES:
+            cache.popitem(last=False)
+
+    def _trim_disk_cache(self):
+        """Keep at most CACHE_DISK_ENTRIES transcripts; drop least recently used (oldest mtime)"""
+        if self._disk_entries is None:
+            self._disk_entries = sum(1 for e in os.scandir(self.cache_dir) if e.name.endswith('.txt'))
+        else:
+            self._disk_entries += 1
+        if self._disk_entries <= self.CACHE_DISK_ENTRIES:
+            return
 
-            if progress_callback:
-                progress_callback(idx + 1, total, f"Hoan thanh chunk {idx + 1}/{total}")
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.txt'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        entries.sort()
+        # Trim to 90% so the directory is not rescanned on every following put
+        excess = len(entries) - int(self.CACHE_DISK_ENTRIES * 0.9)
+        for _, path in entries[:max(excess, 0)]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._disk_entries = len(entries) - max(excess, 0)
 
-            if status_callback:
-                status_callback(f"[TURBO] {idx + 1}/{total} chunks hoan thanh")
+    async def _transcribe_chunk_async(self, session, chunk_path, idx):
+        """Transcribe single chunk asynchronously (bounded by processor.semaphore, retried on 429/5xx)"""
+        try:
+            # Identical chunks (silence, re-runs of the same video) skip Groq
+            cache_key = await asyncio.to_thread(self._cache_key, chunk_path, 'chunk')
+            text = self._cache_get(cache_key)
+            if text is not None:
+                print(f"[TURBO STT] Chunk {idx}: cache hit")
+            else:
+                # Call Groq API
+                headers = {"Authorization": f"Bearer {self.api_key}"}
+                for attempt in range(GROQ_MAX_RETRIES):
+                    # Stream the chunk from disk (aiohttp reads file fields in blocks) instead
+                    # of holding it in memory; FormData can only be sent once - rebuild per attempt
+                    audio_file = open(chunk_path, 'rb')
+                    data = aiohttp.FormData()
+                    data.add_field('file', audio_file, filename='audio.wav', content_type='audio/wav')
+                    data.add_field('model', 'whisper-large-v3')
+                    data.add_field('language', 'zh')
+
+                    retry_after = None
+                    try:
+                        async with self.processor.semaphore:
+                            async with session.post(
+                                'https://api.groq.com/openai/v1/audio/transcriptions',
+                                headers=headers,
+                                data=data,
+                                timeout=aiohttp.ClientTimeout(total=120)
+                            ) as response:
+                                if response.status == 429 or response.status >= 500:
+                                    retry_after = response.headers.get('retry-after')
+                                    raise Exception(f"HTTP {response.status}")
+                                result = await response.json()
+                                text = result.get('text', '')
+                                if response.status == 200:
+                                    self._cache_put(cache_key, text)
+                        break
+                    except Exception as e:
+                        if attempt == GROQ_MAX_RETRIES - 1:
+                            raise
+                        # Backoff outside the semaphore so other chunks keep the slots busy
+                        try:
+                            delay = float(retry_after) if retry_after else 2 ** attempt
+                        except ValueError:
+                            delay = 2 ** attempt
+                        print(f"[TURBO STT] Chunk {idx}: {e} - retry {attempt + 2}/{GROQ_MAX_RETRIES} in {delay:.0f}s")
+                        await asyncio.sleep(delay)
+                    finally:
+                        audio_file.close()
 
             return text
         except Exception as e:
@@ -361,28 +614,37 @@ class TurboSTT:
             if progress_callback:
                 progress_callback(0, 1, "Dang gui len Groq...")
 
-            # Read full audio file
-            async with aiofiles.open(audio_path, 'rb') as f:
-                audio_data = await f.read()
+            # Re-run cua cung file audio tra ve transcript da cache (hash 25MB o thread rieng)
+            cache_key = await asyncio.to_thread(self._cache_key, audio_path, 'direct')
+            text = self._cache_get(cache_key)
+            if text is not None:
+                print("[TURBO STT] Direct transcribe: cache hit")
+                if progress_callback:
+                    progress_callback(1, 1, "Hoan thanh!")
+                return text
 
-            # Call Groq API
-            async with aiohttp.ClientSession() as session:
-                headers = {"Authorization": f"Bearer {self.api_key}"}
+            # Call Groq API - file streamed from disk, not read into memory (up to 25MB)
+            # (plain file object: aiohttp reads it in blocks and sends Content-Length)
+            with open(audio_path, 'rb') as audio_file:
                 data = aiohttp.FormData()
-                data.add_field('file', audio_data, filename=os.path.basename(audio_path),
-                             content_type='audio/mpeg')
+                data.add_field('file', audio_file, filename=os.path.basename(audio_path),
+                               content_type='audio/mpeg')
                 data.add_field('model', 'whisper-large-v3')
                 data.add_field('language', 'zh')
                 data.add_field('response_format', 'verbose_json')
 
-                async with session.post(
-                    'https://api.groq.com/openai/v1/audio/transcriptions',
-                    headers=headers,
-                    data=data,
-                    timeout=aiohttp.ClientTimeout(total=120)
-                ) as response:
-                    result = await response.json()
-                    text = result.get('text', '')
+                async with _session_scope(self.session) as session:
+                    headers = {"Authorization": f"Bearer {self.api_key}"}
+                    async with session.post(
+                        'https://api.groq.com/openai/v1/audio/transcriptions',
+                        headers=headers,
+                        data=data,
+                        timeout=aiohttp.ClientTimeout(total=120)
+                    ) as response:
+                        result = await response.json()
+                        text = result.get('text', '')
+                        if response.status == 200:
+                            self._cache_put(cache_key, text)
 
             if progress_callback:
                 progress_callback(1, 1, "Hoan thanh!")
@@ -400,10 +662,10 @@ class TurboSTT:
 class TurboTTS:
     """Ultra-fast Text-to-Speech with aggressive parallelism"""
 
-    def __init__(self, temp_dir: str = "temp"):
+    def __init__(self, temp_dir: str = "temp", processor: Optional[TurboProcessor] = None):
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
-        self.processor = TurboProcessor()
+        self.processor = processor or TurboProcessor()
 
     async def generate_turbo(self, text: str, voice: str, speed: float = 1.0,
                              progress_callback=None, status_callback=None) -> str:
@@ -429,50 +691,63 @@ class TurboTTS:
         temp_dir = self.temp_dir / "tts_segments"
         temp_dir.mkdir(exist_ok=True)
 
+        if edge_tts is None:
+            raise Exception("edge-tts chua duoc cai dat. Chay: pip install edge-tts")
+
         # Prepare rate for edge-tts
         rate_percent = int((speed - 1.0) * 100)
         rate = f"+{rate_percent}%" if rate_percent >= 0 else f"{rate_percent}%"
 
+        # 1 connector for every segment - edge-tts opens a new ClientSession per Communicate
+        connector = new_shared_connector()
+        communicate_kw = {'connector': connector} if connector is not None else {}
+
+        throttle = _ProgressThrottle()
+        completed = 0
+
         async def generate_segment(idx, segment):
+            nonlocal completed
             output_path = str(temp_dir / f"segment_{idx:04d}.mp3")
             try:
                 # Use edge-tts async
-                import edge_tts
-                communicate = edge_tts.Communicate(segment, voice, rate=rate)
+                communicate = edge_tts.Communicate(segment, voice, rate=rate, **communicate_kw)
                 await communicate.save(output_path)
 
-                if progress_callback:
-                    progress_callback(idx + 1, total, f"Tao giong {idx + 1}/{total}")
-
-                if status_callback:
-                    status_callback(f"[TURBO] {idx + 1}/{total} segments hoan thanh")
+                completed += 1
+                if throttle.ready(completed, total):
+                    if progress_callback:
+                        progress_callback(completed, total, f"Tao giong {completed}/{total}")
+                    if status_callback:
+                        status_callback(f"[TURBO] {completed}/{total} segments hoan thanh")
 
                 return output_path
             except Exception as e:
                 print(f"[TURBO TTS] Segment {idx} error: {e}")
                 return None
 
-        # Run ALL TTS generations in parallel
-        tasks = [generate_segment(i, seg) for i, seg in enumerate(segments)]
-        audio_paths = await asyncio.gather(*tasks)
+        # Run TTS generations in parallel (at most MAX_ASYNC_CONNECTIONS in flight)
+        try:
+            audio_paths = await bounded_gather(
+                (generate_segment(i, seg) for i, seg in enumerate(segments)),
+                MAX_ASYNC_CONNECTIONS
+            )
+        finally:
+            if connector is not None:
+                await connector.aclose()
 
         # Filter out failed segments
-        audio_paths = [p for p in audio_paths if p and os.path.exists(p)]
+        audio_paths = [p for p in audio_paths if isinstance(p, str) and os.path.exists(p)]
 
         if not audio_paths:
             raise Exception("Khong tao duoc bat ky segment nao!")
 
         # Merge all audio files
         output_path = str(self.temp_dir / f"tts_turbo_{uuid.uuid4().hex[:8]}.mp3")
-        self._merge_audio_fast(audio_paths, output_path)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._merge_audio_fast, audio_paths, output_path)
 
         # Cleanup
-        for p in audio_paths:
-            try:
-                if os.path.exists(p):
-                    os.remove(p)
-            except:
-                pass
+        await _remove_files_async(audio_paths)
 
         if status_callback:
             status_callback("[TURBO] Hoan thanh TTS!")
@@ -481,34 +756,43 @@ class TurboTTS:
 
     def _split_text_aggressive(self, text: str, max_chars: int = 200) -> List[str]:
         """Split text into many small segments for maximum parallelism"""
-        import re
-        # Split by sentences
-        sentences = re.split(r'[。.!?！？\n]', text)
         segments = []
-        current = ""
+        # Parts of the current segment, joined once per flush (no repeated str +=)
+        current = []
+        current_len = 0
 
-        for s in sentences:
+        for s in _SENT_RE.split(text):
             s = s.strip()
             if not s:
                 continue
-            if len(current) + len(s) <= max_chars:
-                current += s + "。"
-            else:
-                if current:
-                    segments.append(current)
-                current = s + "。"
+            if current_len + len(s) > max_chars and current:
+                segments.append("".join(current))
+                current = []
+                current_len = 0
+            current.append(s + "。")
+            current_len += len(s) + 1
         if current:
-            segments.append(current)
+            segments.append("".join(current))
 
         return segments if segments else [text]
 
     def _merge_audio_fast(self, audio_paths: List[str], output_path: str):
-        """Fast audio merge using FFmpeg concat"""
+        """Fast audio merge: MP3 frame concat (same stream format), else FFmpeg concat"""
         if len(audio_paths) == 1:
-            import shutil
             shutil.copy(audio_paths[0], output_path)
             return
 
+        # Edge-TTS segments share 1 format -> copy frames (no ID3/Xing), no subprocess
+        infos = [probe_mp3(p) for p in audio_paths]
+        if all(infos) and len({info.stream_key for info in infos}) == 1:
+            try:
+                with open(output_path, 'wb') as out:
+                    for p, info in zip(audio_paths, infos):
+                        copy_mp3_frames(p, info, out)
+                return
+            except OSError as e:
+                print(f"[TURBO TTS] Noi MP3 truc tiep loi: {e} - dung FFmpeg")
+
         concat_file = str(self.temp_dir / f"concat_{uuid.uuid4().hex[:8]}.txt")
 
         try:
@@ -534,10 +818,14 @@ class TurboTTS:
 class TurboDownloader:
     """Ultra-fast video downloader with parallel chunks"""
 
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Shared session (injected by TurboEngine); None -> one session per call
+        self.session = session
+
     async def download_turbo(self, url: str, output_path: str,
                              progress_callback=None, status_callback=None) -> str:
         """
-        Download video in parallel chunks then merge
+        Download video in parallel range requests, each written at its offset
         Much faster than sequential download
 
         Expected: 5-6x faster for large files
@@ -545,62 +833,66 @@ class TurboDownloader:
         if status_callback:
             status_callback("[TURBO] Kiem tra file size...")
 
-        async with aiohttp.ClientSession() as session:
+        async with _session_scope(self.session) as session:
             # Get file size
             async with session.head(url) as response:
                 file_size = int(response.headers.get('content-length', 0))
 
-            if file_size == 0:
-                # Can't chunk, download normally
+            if file_size < MIN_RANGE_SIZE:
+                # Can't chunk (or too small to benefit), download normally
                 if status_callback:
                     status_callback("File khong ho tro chunk, tai binh thuong...")
                 return await self._download_simple(session, url, output_path, progress_callback)
 
+            # 1 range per ~4MB: 20MB -> 5 ranges, 200MB+ -> 16
+            n_chunks = min(MAX_RANGE_CHUNKS, file_size // MIN_RANGE_SIZE)
+
             if status_callback:
-                status_callback(f"[TURBO] Tai {file_size // 1024 // 1024}MB voi 10 chunks song song...")
+                status_callback(f"[TURBO] Tai {file_size // 1024 // 1024}MB voi {n_chunks} chunks song song...")
 
             # Split into chunks
-            chunk_size = file_size // 10  # 10 parallel downloads
+            chunk_size = file_size // n_chunks
+
+            # Pre-size the output; every range is written straight to its own offset
+            # (no .partN files, no second pass to merge them)
+            with open(output_path, 'wb') as f:
+                f.truncate(file_size)
+            loop = asyncio.get_running_loop()
 
             async def download_chunk(start, end, idx):
                 headers = {'Range': f'bytes={start}-{end}'}
-                chunk_path = f"{output_path}.part{idx}"
                 try:
                     async with session.get(url, headers=headers) as response:
-                        async with aiofiles.open(chunk_path, 'wb') as f:
-                            await f.write(await response.read())
+                        if response.status != 206:
+                            raise Exception(f"HTTP {response.status} (server bo qua Range)")
+                        # Own file object per range -> independent seek position
+                        with open(output_path, 'r+b') as f:
+                            f.seek(start)
+                            written = 0
+                            async for piece in response.content.iter_chunked(1 << 20):
+                                await loop.run_in_executor(None, f.write, piece)
+                                written += len(piece)
+                    if written != end - start + 1:
+                        raise Exception(f"Thieu du lieu: {written}/{end - start + 1} bytes")
                     if progress_callback:
-                        progress_callback(idx + 1, 10, f"Tai chunk {idx + 1}/10")
-                    return chunk_path
+                        progress_callback(idx + 1, n_chunks, f"Tai chunk {idx + 1}/{n_chunks}")
+                    return True
                 except Exception as e:
                     print(f"[TURBO Download] Chunk {idx} error: {e}")
-                    return None
+                    return False
 
             # Download ALL chunks in parallel
             tasks = []
-            for i in range(10):
+            for i in range(n_chunks):
                 start = i * chunk_size
-                end = start + chunk_size - 1 if i < 9 else file_size - 1
+                end = start + chunk_size - 1 if i < n_chunks - 1 else file_size - 1
                 tasks.append(download_chunk(start, end, i))
 
-            chunk_paths = await asyncio.gather(*tasks)
-            chunk_paths = [p for p in chunk_paths if p]
+            ok = await asyncio.gather(*tasks)
 
-            if len(chunk_paths) != 10:
+            if not all(ok):
                 raise Exception("Mot so chunks tai that bai!")
 
-            # Merge chunks
-            if status_callback:
-                status_callback("[TURBO] Ghep chunks...")
-
-            async with aiofiles.open(output_path, 'wb') as out:
-                for i in range(10):
-                    chunk_path = f"{output_path}.part{i}"
-                    if os.path.exists(chunk_path):
-                        async with aiofiles.open(chunk_path, 'rb') as chunk:
-                            await out.write(await chunk.read())
-                        os.remove(chunk_path)
-
             if status_callback:
                 status_callback("[TURBO] Hoan thanh download!")
 
@@ -625,13 +917,37 @@ class TurboEngine:
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
 
-        self.stt = TurboSTT(groq_api_key, str(self.temp_dir))
-        self.tts = TurboTTS(str(self.temp_dir))
+        # 1 TurboProcessor (semaphore, cache, lazy pools) shared by every step
+        self.processor = TurboProcessor()
+        self.stt = TurboSTT(groq_api_key, str(self.temp_dir), processor=self.processor)
+        self.tts = TurboTTS(str(self.temp_dir), processor=self.processor)
         self.downloader = TurboDownloader()
 
         self.start_time = None
         self.step_times = {}
 
+        # 1 ClientSession for every step - created in __aenter__ (needs a running loop)
+        self.session = None
+
+    async def __aenter__(self):
+        if self.session is None or self.session.closed:
+            self.session = _new_session()
+            self.stt.session = self.session
+            self.downloader.session = self.session
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the shared session (and the processor pools, if any were started)"""
+        session, self.session = self.session, None
+        self.stt.session = None
+        self.downloader.session = None
+        self.processor.shutdown()
+        if session is not None:
+            await session.close()
+
     async def process_video_turbo(self, video_path: str, voice: str, speed: float = 1.0,
                                   progress_callback=None, status_callback=None) -> dict:
         """
@@ -746,32 +1062,49 @@ class TurboEngine:
         return audio_path
 
     async def _translate_fast(self, text: str, status_callback=None) -> str:
-        """Fast translation using async HTTP with chunking for long text"""
-        from deep_translator import GoogleTranslator
-
-        # For long text, split and translate in parallel
-        if len(text) > 1000:
-            chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
+        """
+        Fast translation: every chunk POSTed to Google gtx at once over the shared session
 
-            def translate_chunk(chunk):
-                return GoogleTranslator(source='zh-CN', target='vi').translate(chunk)
+        POST takes ~5000 chars per request (GET capped us at 1000), and the keep-alive
+        pool means no per-chunk TLS setup - a 10k-char script is 3 concurrent requests.
+        deep_translator (threads) is the fallback if the endpoint fails.
+        """
+        chunks = [text[i:i + TRANSLATE_CHUNK_CHARS]
+                  for i in range(0, len(text), TRANSLATE_CHUNK_CHARS)] or [text]
 
-            # Run in thread pool
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor(max_workers=5) as executor:
+        try:
+            async with _session_scope(self.session) as session:
                 results = await asyncio.gather(*[
-                    loop.run_in_executor(executor, translate_chunk, chunk)
-                    for chunk in chunks
+                    self._google_translate(session, chunk) for chunk in chunks
                 ])
+        except Exception as e:
+            print(f"[TURBO Engine] Google gtx error: {e} - fallback deep_translator")
+            from deep_translator import GoogleTranslator
+
+            # Moi chunk 1 instance rieng: translate() ghi de _url_params cua instance
+            def translate_chunk(chunk):
+                return GoogleTranslator(source='zh-CN', target='vi').translate(chunk)
 
-            return " ".join(results)
-        else:
-            # Short text, translate directly
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                None,
-                lambda: GoogleTranslator(source='zh-CN', target='vi').translate(text)
-            )
+            results = await asyncio.gather(*[
+                loop.run_in_executor(None, translate_chunk, chunk)
+                for chunk in chunks
+            ])
+
+        return " ".join(results)
+
+    @staticmethod
+    async def _google_translate(session: aiohttp.ClientSession, text: str) -> str:
+        """1 request translate_a/single (client=gtx), text trong body POST"""
+        async with session.post(
+            'https://translate.googleapis.com/translate_a/single',
+            params={'client': 'gtx', 'sl': 'zh-CN', 'tl': 'vi', 'dt': 't'},
+            data={'q': text},
+            timeout=aiohttp.ClientTimeout(total=30)
+        ) as response:
+            response.raise_for_status()
+            result = await response.json(content_type=None)
+        return "".join(part[0] for part in result[0] if part and part[0])
 
 
 # Helper function to run turbo engine from sync context
@@ -789,10 +1122,11 @@ def run_turbo_engine(groq_api_key: str, video_path: str, voice: str,
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
+    async def _run():
+        async with engine:
+            return await engine.process_video_turbo(video_path, voice, speed, progress_callback, status_callback)
+
     try:
-        result = loop.run_until_complete(
-            engine.process_video_turbo(video_path, voice, speed, progress_callback, status_callback)
-        )
-        return result
+        return loop.run_until_complete(_run())
     finally:
         loop.close()
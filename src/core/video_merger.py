@@ -7,8 +7,35 @@ import os
 import subprocess
 import uuid
 import json
+from functools import lru_cache
 from pathlib import Path
 
+from src.utils.audio_info import read_audio_duration
+
+
+@lru_cache(maxsize=256)
+def _probe_cached(path: str, size: int, mtime_ns: int) -> dict:
+    """1 lan ffprobe (format + streams) cho moi phien ban file - loi thi raise, khong cache"""
+    cmd = [
+        'ffprobe', '-v', 'quiet',
+        '-print_format', 'json',
+        '-show_format', '-show_streams',
+        path
+    ]
+    result = subprocess.run(
+        cmd, capture_output=True, text=True,
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffprobe loi ({result.returncode}): {path}")
+    return json.loads(result.stdout)
+
+
+def _probe(path: str) -> dict:
+    """ffprobe JSON cua file, cache theo (path, size, mtime) - file bi ghi lai thi probe lai"""
+    st = os.stat(path)
+    return _probe_cached(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
 
 class VideoMerger:
     """Ghep video voi audio moi va cac hieu ung - toi uu hieu suat"""
@@ -388,52 +415,24 @@ class VideoMerger:
     def get_video_duration(self, video_path: str) -> float:
         """Lay thoi luong video (giay)"""
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                video_path
-            ]
-            result = subprocess.run(
-                cmd, capture_output=True, text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-            return float(result.stdout.strip())
-        except:
+            return float(_probe(video_path)["format"]["duration"])
+        except Exception:
             return 0.0
 
     def _get_audio_duration(self, audio_path: str) -> float:
-        """Lay thoi luong audio (giay)"""
+        """Lay thoi luong audio (giay) - doc header MP3/WAV, fallback ffprobe"""
+        duration = read_audio_duration(audio_path)
+        if duration:
+            return duration
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                audio_path
-            ]
-            result = subprocess.run(
-                cmd, capture_output=True, text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-            return float(result.stdout.strip())
-        except:
+            return float(_probe(audio_path)["format"]["duration"])
+        except Exception:
             return 0.0
 
     def get_video_info(self, video_path: str) -> dict:
         """Lay thong tin video"""
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format', '-show_streams',
-                video_path
-            ]
-            result = subprocess.run(
-                cmd, capture_output=True, text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-
-            data = json.loads(result.stdout)
+            data = _probe(video_path)
 
             info = {
                 "duration": float(data.get("format", {}).get("duration", 0)),
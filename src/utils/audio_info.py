@@ -0,0 +1,212 @@
+"""
+Doc thong tin audio truc tiep tu header - KHONG spawn ffprobe
+
+MP3: doc ID3v2 -> frame header dau tien -> Xing/Info/VBRI (VBR) hoac tinh
+theo bitrate (CBR). WAV: doc header bang module wave.
+Tra ve None neu khong parse duoc de caller fallback ffprobe.
+"""
+import os
+import struct
+import wave
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    from mutagen.mp3 import MP3 as _MutagenMP3
+except ImportError:
+    _MutagenMP3 = None
+
+# Bang bitrate (kbps) Layer III
+_BITRATES_V1_L3 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+_BITRATES_V2_L3 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0)
+
+# Sample rate theo version: 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def _id3v2_size(header: bytes) -> int:
+    """Kich thuoc tag ID3v2 (bao gom header 10 byte), 0 neu khong co"""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+@dataclass
+class Mp3Info:
+    """Thong tin stream MP3 Layer III doc tu header"""
+    audio_start: int       # Offset frame audio dau tien (sau ID3v2 va frame Xing/VBRI)
+    audio_end: int         # Offset ket thuc audio (truoc ID3v1)
+    version: int
+    sample_rate: int
+    channel_mode: int
+    bitrate: int           # bps cua frame dau tien
+    samples_per_frame: int
+    frames: Optional[int]  # Tu tag Xing/Info/VBRI, None neu CBR khong co tag
+
+    @property
+    def duration(self) -> float:
+        if self.frames:
+            return self.frames * self.samples_per_frame / self.sample_rate
+        return (self.audio_end - self.audio_start) * 8 / self.bitrate
+
+    @property
+    def stream_key(self) -> tuple:
+        """Cac file co cung key co the noi frame truc tiep (byte concat)"""
+        return (self.version, self.sample_rate, self.channel_mode, self.frames is None and self.bitrate)
+
+
+def probe_mp3(path: str) -> Optional[Mp3Info]:
+    """Parse header MP3, None neu khong phai MP3 Layer III hop le"""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            audio_start = _id3v2_size(f.read(10))
+            f.seek(audio_start)
+            buf = f.read(4096)
+
+            # ID3v1 tag 128 byte o cuoi file
+            tail_size = 0
+            if file_size >= 128:
+                f.seek(file_size - 128)
+                if f.read(3) == b'TAG':
+                    tail_size = 128
+    except OSError:
+        return None
+
+    # Container khac (WAV/Ogg/FLAC/MP4) co the chua byte giong frame sync
+    if buf[:4] in (b'RIFF', b'OggS', b'fLaC') or buf[4:8] == b'ftyp':
+        return None
+
+    # Tim frame sync dau tien - xac nhan bang frame tiep theo
+    pos = 0
+    while pos + 4 <= len(buf):
+        if buf[pos] == 0xFF and (buf[pos + 1] & 0xE0) == 0xE0:
+            version = (buf[pos + 1] >> 3) & 0x03
+            layer = (buf[pos + 1] >> 1) & 0x03
+            bitrate_idx = buf[pos + 2] >> 4
+            rate_idx = (buf[pos + 2] >> 2) & 0x03
+            if version != 1 and layer == 1 and 0 < bitrate_idx < 15 and rate_idx < 3:
+                is_v1 = version == 3
+                sample_rate = _SAMPLE_RATES[version][rate_idx]
+                bitrate = (_BITRATES_V1_L3 if is_v1 else _BITRATES_V2_L3)[bitrate_idx] * 1000
+                padding = (buf[pos + 2] >> 1) & 0x01
+                frame_len = (144 if is_v1 else 72) * bitrate // sample_rate + padding
+                nxt = pos + frame_len
+                if nxt + 2 > len(buf) or (buf[nxt] == 0xFF and (buf[nxt + 1] & 0xE0) == 0xE0):
+                    break
+        pos += 1
+    else:
+        return None
+
+    samples_per_frame = 1152 if is_v1 else 576
+    channel_mode = buf[pos + 3] >> 6
+    mono = channel_mode == 3
+    frames = None
+    tag_frame = False
+
+    # VBR: Xing/Info nam sau side info
+    side_info = (17 if mono else 32) if is_v1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    vbri = pos + 4 + 32
+    if buf[xing:xing + 4] in (b'Xing', b'Info') and len(buf) >= xing + 12:
+        tag_frame = True
+        flags = struct.unpack('>I', buf[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack('>I', buf[xing + 8:xing + 12])[0]
+    # VBR: VBRI (Fraunhofer) luon o offset 32 sau header
+    elif buf[vbri:vbri + 4] == b'VBRI' and len(buf) >= vbri + 18:
+        tag_frame = True
+        frames = struct.unpack('>I', buf[vbri + 14:vbri + 18])[0]
+
+    first_audio = audio_start + pos + (frame_len if tag_frame else 0)
+    audio_end = file_size - tail_size
+    if audio_end <= first_audio:
+        return None
+
+    return Mp3Info(
+        audio_start=first_audio,
+        audio_end=audio_end,
+        version=version,
+        sample_rate=sample_rate,
+        channel_mode=channel_mode,
+        bitrate=bitrate,
+        samples_per_frame=samples_per_frame,
+        frames=frames,
+    )
+
+
+def copy_mp3_frames(path: str, info: Mp3Info, out) -> int:
+    """Ghi cac frame audio cua file (bo ID3 va frame Xing/Info) vao file object `out`"""
+    written = 0
+    with open(path, 'rb') as f:
+        f.seek(info.audio_start)
+        remaining = info.audio_end - info.audio_start
+        while remaining > 0:
+            data = f.read(min(remaining, 1 << 20))
+            if not data:
+                break
+            out.write(data)
+            remaining -= len(data)
+            written += len(data)
+    return written
+
+
+def is_mp3_head(head: bytes) -> bool:
+    """4 byte dau file la tag ID3v2 hoac frame sync MPEG"""
+    return head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0)
+
+
+def looks_like_mp3(path: str, min_size: int = 500) -> bool:
+    """
+    Kiem tra nhanh file MP3: 1 lan open + fstat + doc 4 byte dau
+
+    Thay cho exists() + getsize(), bat them truong hop file du lon nhung khong phai MP3.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size <= min_size:
+                return False
+            head = f.read(4)
+    except OSError:
+        return False
+    return is_mp3_head(head)
+
+
+def read_mp3_duration(path: str) -> Optional[float]:
+    """Thoi luong MP3 (giay) tu header, None neu khong phai MP3 Layer III hop le"""
+    if _MutagenMP3 is not None:
+        try:
+            return float(_MutagenMP3(path).info.length)
+        except Exception:
+            pass
+
+    info = probe_mp3(path)
+    return info.duration if info is not None else None
+
+
+def read_wav_duration(path: str) -> Optional[float]:
+    """Thoi luong WAV PCM (giay) tu header, None neu khong doc duoc"""
+    try:
+        with wave.open(path, 'rb') as w:
+            rate = w.getframerate()
+            return w.getnframes() / rate if rate else None
+    except (OSError, EOFError, wave.Error):
+        return None
+
+
+def read_audio_duration(path: str) -> Optional[float]:
+    """Thoi luong MP3/WAV tu header theo magic bytes, None neu dinh dang khac"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4)
+    except OSError:
+        return None
+    if head == b'RIFF':
+        return read_wav_duration(path)
+    return read_mp3_duration(path)
@@ -0,0 +1,43 @@
+"""
+aiohttp connector dung chung cho cac lan goi edge-tts
+
+edge-tts tu mo ClientSession (va connector) cho moi Communicate; connector o day
+duoc truyen vao tat ca Communicate trong 1 lan chay de giu ket noi keep-alive.
+"""
+import inspect
+
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
+
+def new_shared_connector():
+    """
+    Tao aiohttp connector dung chung cho tat ca chunk trong 1 lan chay
+
+    edge-tts tu dong ClientSession (va ca connector) sau moi Communicate,
+    nen connector nay bo qua close() cua session - chi dong khi goi aclose().
+    Tra ve None neu edge-tts/aiohttp khong ho tro.
+    """
+    if edge_tts is None:
+        return None
+    try:
+        import aiohttp
+        if 'connector' not in inspect.signature(edge_tts.Communicate).parameters:
+            return None
+    except (ImportError, TypeError, ValueError):
+        return None
+
+    class _SharedConnector(aiohttp.TCPConnector):
+        def close(self):
+            async def _noop():
+                return None
+            return _noop()
+
+        async def aclose(self):
+            result = super().close()
+            if inspect.isawaitable(result):
+                await result
+
+    return _SharedConnector(limit=0, ttl_dns_cache=300)
@@ -84,9 +84,9 @@ class TranscribeWorker(QThread):
 
     def run(self):
         try:
-            from src.core.speech_to_text import SpeechToText
+            from src.core.speech_to_text import create_speech_to_text
 
-            stt = SpeechToText()
+            stt = create_speech_to_text()
             result = stt.transcribe(
                 self.audio_path,
                 engine=self.engine,
@@ -173,6 +173,8 @@ class TTSWorker(CancellableWorker):
         "vi-VN-NamMinhNeural (Nam)": "vi-VN-NamMinhNeural",
     }
 
+    VOICE_MAP = {**GEMINI_VOICE_MAP, **EDGE_VOICE_MAP}
+
     def __init__(self, text: str, voice: str, speed: float = 1.0,
                  use_parallel: bool = False, num_threads: int = 2):
         super().__init__()
@@ -184,14 +186,8 @@ class TTSWorker(CancellableWorker):
 
     def _convert_voice(self, voice: str) -> str:
         """Convert ten giong tu UI sang API format"""
-        # Check Gemini voices
-        if voice in self.GEMINI_VOICE_MAP:
-            return self.GEMINI_VOICE_MAP[voice]
-        # Check Edge-TTS voices
-        if voice in self.EDGE_VOICE_MAP:
-            return self.EDGE_VOICE_MAP[voice]
-        # Return as-is if already in correct format
-        return voice
+        # Gemini/Edge-TTS voices - tra nguyen neu da dung format
+        return self.VOICE_MAP.get(voice, voice)
 
     def run(self):
         try:
@@ -237,11 +233,13 @@ class TTSWorker(CancellableWorker):
                 self.status.emit(f"Dang tao giong noi...")
                 self.progress.emit(30)
 
+                # Audio chi dung de ghep vao video (FFmpeg encode lai) -> WAV la du
                 audio_path = tts.generate(
                     text=self.text,
                     voice=self.voice,
                     speed=self.speed,
-                    progress_callback=lambda p: self.progress.emit(30 + int(p * 0.6))
+                    progress_callback=lambda p: self.progress.emit(30 + int(p * 0.6)),
+                    output_format="wav"
                 )
 
             if self.is_cancelled():